@@ -0,0 +1,153 @@
+"""Run the tap end to end against the local stand-in Riot API.
+
+Syncs a configured set of players and ladders from ``benchmarks.mock_riot_api``
+and reports throughput, time spent sleeping on rate limits and peak memory::
+
+    python -m benchmarks.end_to_end --ladder-size 400 --latency 0.02
+    python -m benchmarks.end_to_end --tap-config '{"concurrent_sync": true}'
+
+``--save FILE`` writes the results as JSON; ``--baseline FILE`` compares against
+such a file and exits non-zero if records/s dropped by more than
+``--tolerance``, so a change can be checked for regressions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import resource
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from unittest import mock
+
+from benchmarks.mock_riot_api import MockRiotAPI, SyntheticWorld
+from tap_riotapi import client
+from tap_riotapi.tap import TapRiotAPI
+
+
+class _MessageCounter(io.TextIOBase):
+    """Stands in for stdout, counting messages by type instead of keeping them."""
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text)
+        for line in text.splitlines():
+            # Every writer puts the type first.
+            message_type = line[9 : line.find('"', 9)]
+            self.counts[message_type] = self.counts.get(message_type, 0) + 1
+        return len(text)
+
+
+def tap_config(api_url: str, players: int, overrides: dict) -> dict:
+    return {
+        "auth_token": "mock",
+        "api_base_url": api_url,
+        "start_date": (datetime.now(timezone.utc) - timedelta(days=7)).isoformat(),
+        "following": {
+            "NA1": {
+                "players": [f"player{index}#NA1" for index in range(players)],
+                "leagues": [{"name": "challenger"}, {"name": "iron", "division": 4}],
+            },
+            "EUW1": {"leagues": [{"name": "iron", "division": 4}]},
+        },
+    } | overrides
+
+
+def run(args: argparse.Namespace) -> dict:
+    world = SyntheticWorld(
+        ladder_size=args.ladder_size,
+        apex_size=args.apex_size,
+        matches_per_player=args.matches_per_player,
+        seed=args.seed,
+    )
+    server = MockRiotAPI(
+        world,
+        app_limits=args.app_limits,
+        method_limits=args.method_limits,
+        latency=args.latency,
+        replay=args.replay,
+    )
+    slept = 0.0
+
+    def counted_sleep(seconds: float):
+        nonlocal slept
+        slept += seconds
+        real_sleep(seconds)
+
+    real_sleep = client.sleep
+    output = _MessageCounter()
+    with server, mock.patch.object(client, "sleep", counted_sleep):
+        config = tap_config(server.url, args.players, json.loads(args.tap_config))
+        start = perf_counter()
+        with redirect_stdout(output):
+            TapRiotAPI(config=config, state={}, parse_env_config=False).sync_all()
+        elapsed = perf_counter() - start
+
+    records = output.counts.get("RECORD", 0)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "records": records,
+        "records_per_s": round(records / elapsed, 1),
+        "requests": server.requests,
+        "requests_per_s": round(server.requests / elapsed, 1),
+        "throttled": server.throttled,
+        "rate_limit_sleep_s": round(slept, 3),
+        "state_messages": output.counts.get("STATE", 0),
+        "output_mb": round(output.bytes / 1e6, 2),
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--ladder-size", type=int, default=300)
+    parser.add_argument("--apex-size", type=int, default=50)
+    parser.add_argument("--matches-per-player", type=int, default=20)
+    parser.add_argument("--app-limits", default="500:10,30000:600")
+    parser.add_argument("--method-limits", default="2000:10")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", metavar="CASSETTE")
+    parser.add_argument(
+        "--tap-config", default="{}", help="JSON merged into the tap's config"
+    )
+    parser.add_argument("--save", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = run(args)
+    for name, value in results.items():
+        print(f"{name:<20}{value:>12}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        change = results["records_per_s"] / baseline["records_per_s"] - 1
+        print(f"records/s vs baseline: {change:+.1%}")
+        if change < -args.tolerance:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
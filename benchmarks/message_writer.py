@@ -0,0 +1,144 @@
+"""Compare the default and fast message writers on match detail records.
+
+Writes the same RECORD messages, with a STATE message every ``--state-every``
+records, through ``MessageWriter`` and ``FastMessageWriter`` into ``/dev/null``::
+
+    python -m benchmarks.message_writer --records 20000
+
+Records are shaped like ``/tft/match/v1/matches/{matchId}`` responses: eight
+participants with their traits and a full board of itemised units.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from time import perf_counter
+
+from singer_sdk.singerlib import RecordMessage, StateMessage
+
+from tap_riotapi.utils import FastMessageWriter, MessageWriter, orjson
+
+TRAITS = [f"TFT13_Trait{index}" for index in range(28)]
+UNITS = [f"TFT13_Champion{index}" for index in range(60)]
+ITEMS = [f"TFT_Item_{index}" for index in range(45)]
+
+
+def match_detail(rng: random.Random, match_number: int) -> dict:
+    participants = []
+    for placement in range(1, 9):
+        participants.append(
+            {
+                "gold_left": rng.randint(0, 60),
+                "last_round": rng.randint(18, 40),
+                "level": rng.randint(6, 10),
+                "placement": placement,
+                "players_eliminated": rng.randint(0, 3),
+                "puuid": f"{rng.getrandbits(256):064x}",
+                "riotIdGameName": f"player{rng.randint(0, 10**6)}",
+                "riotIdTagline": "NA1",
+                "time_eliminated": rng.uniform(900, 2400),
+                "total_damage_to_players": rng.randint(0, 200),
+                "win": placement <= 4,
+                "traits": [
+                    {
+                        "name": name,
+                        "num_units": rng.randint(1, 6),
+                        "style": rng.randint(0, 4),
+                        "tier_current": rng.randint(0, 3),
+                        "tier_total": 3,
+                    }
+                    for name in rng.sample(TRAITS, 9)
+                ],
+                "units": [
+                    {
+                        "character_id": name,
+                        "rarity": rng.randint(0, 6),
+                        "tier": rng.randint(1, 3),
+                        "itemNames": rng.sample(ITEMS, rng.randint(0, 3)),
+                    }
+                    for name in rng.sample(UNITS, 9)
+                ],
+            }
+        )
+    return {
+        "metadata": {
+            "data_version": "6",
+            "match_id": f"NA1_{5_000_000_000 + match_number}",
+            "participants": [participant["puuid"] for participant in participants],
+        },
+        "info": {
+            "endOfGameResult": "GameComplete",
+            "gameCreation": 1_760_000_000_000 + match_number,
+            "gameId": 5_000_000_000 + match_number,
+            "game_datetime": datetime.now(timezone.utc),
+            "game_length": rng.uniform(1800, 2400),
+            "game_version": "Version 15.20.716.5123",
+            "mapId": 22,
+            "queueId": 1100,
+            "queue_id": 1100,
+            "tft_game_type": "standard",
+            "tft_set_core_name": "TFTSet13",
+            "tft_set_number": 13,
+            "participants": participants,
+        },
+    }
+
+
+def run(writer, messages: list) -> float:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = perf_counter()
+        for message in messages:
+            writer.write_message(message)
+        if isinstance(writer, FastMessageWriter):
+            writer.flush()
+        return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--state-every", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = []
+    for index in range(args.records):
+        messages.append(
+            RecordMessage(
+                stream="tft_player_match_detail",
+                record=match_detail(rng, index),
+                time_extracted=datetime.now(timezone.utc),
+            )
+        )
+        if (index + 1) % args.state_every == 0:
+            messages.append(
+                StateMessage(value={"bookmarks": {}, "match_detail_set": {}})
+            )
+
+    # Both writers have to produce the same JSON.
+    sample = messages[0]
+    assert json.loads(MessageWriter().serialize_message(sample)) == json.loads(
+        FastMessageWriter().serialize_message(sample)
+    )
+
+    if orjson is None:
+        print("orjson is not installed; FastMessageWriter only adds buffering.")
+
+    print(f"{'writer':<20}{'seconds':>10}{'records/s':>12}{'MB/s':>8}")
+    size = sum(len(MessageWriter().serialize_message(m)) + 1 for m in messages)
+    for writer in (MessageWriter(), FastMessageWriter()):
+        elapsed = run(writer, messages)
+        print(
+            f"{type(writer).__name__:<20}{elapsed:>10.3f}"
+            f"{args.records / elapsed:>12.0f}{size / elapsed / 1e6:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
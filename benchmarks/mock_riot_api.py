@@ -0,0 +1,502 @@
+"""Local stand-in for the Riot API, for tests and benchmarks.
+
+Serves the endpoints the tap uses under ``http://host:port/{routing_value}``,
+which is what the tap's ``api_base_url`` setting should point at::
+
+    python -m benchmarks.mock_riot_api --port 8080 --ladder-size 500
+
+Responses come from one of three places:
+
+* a synthetic, seeded world of players, ladders and matches (the default), with
+  Riot's fixed-window rate limits enforced per API key, routing value and method,
+  and 429s with ``Retry-After`` once a window is full;
+* the real API (``--record CASSETTE``), with every response written to a
+  cassette file as it passes through. The API key is taken from the tap's
+  requests and never recorded;
+* a cassette recorded earlier (``--replay CASSETTE``), for repeatable runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import ceil
+from time import monotonic, sleep
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from benchmarks.message_writer import match_detail
+from benchmarks.rate_windows import Window, format_counts, parse_limits
+
+UPSTREAM_URL = "https://{routing_value}.api.riotgames.com"
+PAGE_SIZE = 205
+RECORDED_HEADERS = (
+    "Content-Type",
+    "Retry-After",
+    "X-App-Rate-Limit",
+    "X-App-Rate-Limit-Count",
+    "X-Method-Rate-Limit",
+    "X-Method-Rate-Limit-Count",
+    "X-Rate-Limit-Type",
+)
+
+
+class Reply(NamedTuple):
+
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+
+def _number(*parts: str) -> int:
+    digest = hashlib.blake2b("/".join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class SyntheticWorld:
+    """Seeded players, ladders and matches, generated on request.
+
+    Every ladder has ``ladder_size`` players, and every player has played
+    ``matches_per_player`` matches, drawn from a shared pool so that players
+    keep turning up in each other's lobbies the way ladder neighbours do.
+    """
+
+    def __init__(
+        self,
+        ladder_size: int = 300,
+        apex_size: int = 50,
+        matches_per_player: int = 20,
+        lobby_overlap: float = 0.5,
+        seed: int = 0,
+    ):
+        self.ladder_size = ladder_size
+        self.apex_size = apex_size
+        self.matches_per_player = matches_per_player
+        self.seed = seed
+        # Fewer distinct matches than player-matches means shared lobbies.
+        self._match_pool = max(
+            1, int(ladder_size * matches_per_player * (1 - lobby_overlap))
+        )
+
+    def puuid(self, *parts: str) -> str:
+        return f"{_number(str(self.seed), *parts):016x}".rjust(78, "0")
+
+    def account(self, game_name: str, tag_line: str) -> dict:
+        return {
+            "puuid": self.puuid("account", game_name.lower(), tag_line.lower()),
+            "gameName": game_name,
+            "tagLine": tag_line,
+        }
+
+    def _entry(self, puuid: str) -> dict:
+        games = 20 + _number(puuid, "games") % 200
+        wins = games // 2
+        return {
+            "puuid": puuid,
+            "leaguePoints": _number(puuid, "lp") % 100,
+            "wins": wins,
+            "losses": games - wins,
+        }
+
+    def apex_league(self, platform: str, tier: str) -> dict:
+        return {
+            "tier": tier.upper(),
+            "entries": [
+                self._entry(self.puuid(platform, tier, str(index)))
+                for index in range(self.apex_size)
+            ],
+        }
+
+    def league_page(self, platform: str, tier: str, division: str, page: int) -> list:
+        start = (page - 1) * PAGE_SIZE
+        end = min(start + PAGE_SIZE, self.ladder_size)
+        return [
+            self._entry(self.puuid(platform, tier, division, str(index)))
+            for index in range(start, end)
+        ]
+
+    def match_ids(self, puuid: str, start: int, count: int) -> list:
+        # Every match is an NA1 match; the tap routes match details by the
+        # player's region, not by the prefix.
+        rng = random.Random(_number(puuid, "matches"))
+        numbers = rng.sample(
+            range(self._match_pool), min(self.matches_per_player, self._match_pool)
+        )
+        numbers.sort(reverse=True)
+        return [f"NA1_{5_000_000_000 + number}" for number in numbers][
+            start : start + count
+        ]
+
+    def match(self, match_id: str) -> dict:
+        number = int(match_id.rpartition("_")[2])
+        detail = match_detail(random.Random(number), number)
+        detail["metadata"]["match_id"] = match_id
+        detail["info"]["game_datetime"] = 1_760_000_000_000 + number
+        return detail
+
+
+class RiotRateLimits:
+    """Riot's fixed windows, per API key and routing value, app-wide and per method."""
+
+    def __init__(self, app_limits: str, method_limits: str):
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self._lock = threading.Lock()
+        self._app: dict[tuple[str, str], list[Window]] = {}
+        self._method: dict[tuple[str, str, str], list[Window]] = {}
+
+    def admit(
+        self, token: str, routing_value: str, method: str
+    ) -> tuple[dict[str, str], float | None]:
+        """Count a request, returning its headers and ``Retry-After`` if throttled."""
+        with self._lock:
+            now = monotonic()
+            app = self._app.setdefault(
+                (token, routing_value), parse_limits(self.app_limits)
+            )
+            per_method = self._method.setdefault(
+                (token, routing_value, method), parse_limits(self.method_limits)
+            )
+            headers = {}
+            full = [window for window in app + per_method if window.full(now)]
+            if full:
+                retry_after = max(window.window_end for window in full) - now
+                headers["X-Rate-Limit-Type"] = (
+                    "application" if set(full) & set(app) else "method"
+                )
+            else:
+                retry_after = None
+                for window in app + per_method:
+                    window.admit(now)
+            headers.update(
+                {
+                    "X-App-Rate-Limit": self.app_limits,
+                    "X-App-Rate-Limit-Count": format_counts(app),
+                    "X-Method-Rate-Limit": self.method_limits,
+                    "X-Method-Rate-Limit-Count": format_counts(per_method),
+                }
+            )
+            return headers, retry_after
+
+
+class Cassette:
+    """Responses keyed by request line, stored as JSON lines.
+
+    A request recorded several times is replayed in the order it was recorded,
+    repeating the last response once they run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._replies: dict[str, list[Reply]] = {}
+        self._served: dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: str) -> Cassette:
+        cassette = cls(path)
+        with open(path) as file:
+            for line in file:
+                entry = json.loads(line)
+                cassette._replies.setdefault(entry["request"], []).append(
+                    Reply(entry["status"], entry["headers"], entry["body"].encode())
+                )
+        return cassette
+
+    def record(self, request: str, reply: Reply) -> None:
+        entry = {
+            "request": request,
+            "status": reply.status,
+            "headers": reply.headers,
+            "body": reply.body.decode(),
+        }
+        with self._lock, open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def replay(self, request: str) -> Reply | None:
+        with self._lock:
+            replies = self._replies.get(request)
+            if not replies:
+                return None
+            served = self._served.get(request, 0)
+            self._served[request] = served + 1
+            return replies[min(served, len(replies) - 1)]
+
+
+class MockRiotAPI:
+    """The stand-in server, run on a background thread.
+
+    Use as a context manager; ``url`` is the value for the tap's
+    ``api_base_url`` setting. Requests with one of ``revoked_keys`` are answered
+    with a 403. With ``encrypt_puuids`` set, PUUIDs are encrypted per API key,
+    as Riot does per application, and a PUUID sent with another key than the
+    one it was served to gets a 400. Bodies are gzipped for clients that accept
+    it, ``connections`` counts the connections clients opened, and
+    ``peak_in_flight`` is the most requests that were being answered at once.
+    """
+
+    def __init__(
+        self,
+        world: SyntheticWorld | None = None,
+        *,
+        app_limits: str = "500:10,30000:600",
+        method_limits: str = "2000:10",
+        latency: float = 0.0,
+        revoked_keys: tuple[str, ...] = (),
+        encrypt_puuids: bool = False,
+        record: str | None = None,
+        replay: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.world = world or SyntheticWorld()
+        self.limits = RiotRateLimits(app_limits, method_limits)
+        self.latency = latency
+        self.revoked_keys = set(revoked_keys)
+        self.encrypt_puuids = encrypt_puuids
+        self.recorder = Cassette(record) if record else None
+        self.cassette = Cassette.load(replay) if replay else None
+        self.requests = 0
+        self.throttled = 0
+        self.connections = 0
+        self.peak_in_flight = 0
+        self._in_flight = 0
+        self._counter_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{{routing_value}}"
+
+    def __enter__(self) -> MockRiotAPI:
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-riot-api", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle's
+            # algorithm holds the body back for a delayed ACK on every request.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with api._counter_lock:
+                    api.connections += 1
+
+            def do_GET(self):
+                reply = api.handle(self.path, self.headers.get("X-Riot-Token", ""))
+                body = reply.body
+                self.send_response(reply.status)
+                for name, value in reply.headers.items():
+                    self.send_header(name, value)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=1)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request_path: str, token: str) -> Reply:
+        """Answer ``GET request_path``, where the path starts with the routing value."""
+        with self._counter_lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        try:
+            return self._handle(request_path, token)
+        finally:
+            with self._counter_lock:
+                self._in_flight -= 1
+
+    def _handle(self, request_path: str, token: str) -> Reply:
+        if self.latency:
+            sleep(self.latency)
+
+        if token in self.revoked_keys:
+            reply = _json_reply(403, {"status": {"message": "Forbidden"}})
+        elif self.cassette is not None:
+            reply = self.cassette.replay(request_path)
+            if reply is None:
+                return _json_reply(404, {"status": {"message": "Not in cassette"}})
+        elif self.recorder is not None:
+            reply = self._forward(request_path, token)
+            self.recorder.record(request_path, reply)
+        else:
+            reply = self._synthetic(request_path, token)
+
+        if reply.status == 429:
+            with self._counter_lock:
+                self.throttled += 1
+        return reply
+
+    def _forward(self, request_path: str, token: str) -> Reply:
+        routing_value, _, rest = request_path.lstrip("/").partition("/")
+        response = requests.get(
+            UPSTREAM_URL.format(routing_value=routing_value) + "/" + rest,
+            headers={"X-Riot-Token": token},
+            timeout=30,
+        )
+        headers = {
+            name: response.headers[name]
+            for name in RECORDED_HEADERS
+            if name in response.headers
+        }
+        return Reply(response.status_code, headers, response.content)
+
+    def _synthetic(self, request_path: str, token: str) -> Reply:
+        url = urlsplit(request_path)
+        routing_value, _, path = url.path.lstrip("/").partition("/")
+        parts = path.split("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        # Riot counts against the method by its path template.
+        match parts:
+            case ["riot", "account", "v1", "accounts", "by-riot-id", name, tag]:
+                method = "account"
+
+                def produce():
+                    return self.world.account(name, tag)
+
+            case ["tft", "league", "v1", "entries", tier, division]:
+                page = int(query.get("page", 1))
+                method = "league-entries"
+
+                def produce():
+                    return self.world.league_page(routing_value, tier, division, page)
+
+            case ["tft", "league", "v1", tier]:
+                method = "apex-league"
+
+                def produce():
+                    return self.world.apex_league(routing_value, tier)
+
+            case ["tft", "match", "v1", "matches", "by-puuid", puuid, "ids"]:
+                if self.encrypt_puuids:
+                    puuid = _decrypt_puuid(token, puuid)
+                    if puuid is None:
+                        message = "Bad Request - Exception decrypting"
+                        return _json_reply(400, {"status": {"message": message}})
+                method = "match-ids"
+                start, count = int(query.get("start", 0)), int(query.get("count", 20))
+
+                def produce():
+                    return self.world.match_ids(puuid, start, count)
+
+            case ["tft", "match", "v1", "matches", match_id]:
+                method = "match"
+
+                def produce():
+                    return self.world.match(match_id)
+
+            case _:
+                return _json_reply(404, {"status": {"message": "Not found"}})
+
+        headers, retry_after = self.limits.admit(token, routing_value, method)
+        if retry_after is not None:
+            headers["Retry-After"] = str(ceil(retry_after))
+            throttled = {"status": {"message": "Rate limit exceeded"}}
+            return _json_reply(429, throttled, headers)
+        payload = produce()
+        if self.encrypt_puuids:
+            payload = _encrypt_puuids(token, payload)
+        return _json_reply(200, payload, headers)
+
+
+def _key_tag(token: str) -> str:
+    # Stands in for the leading zeros of every synthetic PUUID.
+    return f"{_number('key', token):016x}"
+
+
+def _encrypt_puuids(token: str, payload):
+    if isinstance(payload, list):
+        return [_encrypt_puuids(token, item) for item in payload]
+    if isinstance(payload, dict):
+        return {
+            name: _key_tag(token) + value[16:]
+            if name == "puuid"
+            else _encrypt_puuids(token, value)
+            for name, value in payload.items()
+        }
+    return payload
+
+
+def _decrypt_puuid(token: str, puuid: str) -> str | None:
+    if not puuid.startswith(_key_tag(token)):
+        return None
+    return "0" * 16 + puuid[16:]
+
+
+def _json_reply(status: int, payload, headers: dict[str, str] | None = None) -> Reply:
+    headers = dict(headers or {})
+    headers["Content-Type"] = "application/json;charset=utf-8"
+    return Reply(status, headers, json.dumps(payload).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ladder-size", type=int, default=300)
+    parser.add_argument("--apex-size", type=int, default=50)
+    parser.add_argument("--matches-per-player", type=int, default=20)
+    parser.add_argument("--app-limits", default="500:10,30000:600")
+    parser.add_argument("--method-limits", default="2000:10")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--record", metavar="CASSETTE")
+    source.add_argument("--replay", metavar="CASSETTE")
+    args = parser.parse_args()
+
+    world = SyntheticWorld(
+        ladder_size=args.ladder_size,
+        apex_size=args.apex_size,
+        matches_per_player=args.matches_per_player,
+        seed=args.seed,
+    )
+    server = MockRiotAPI(
+        world,
+        app_limits=args.app_limits,
+        method_limits=args.method_limits,
+        latency=args.latency,
+        record=args.record,
+        replay=args.replay,
+        host=args.host,
+        port=args.port,
+    )
+    with server:
+        print(f"Serving on {server.url} (Ctrl-C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Compare burst-then-sleep and paced request scheduling.
+
+Drives ``RateLimitState`` against a simulated Riot endpoint on a simulated clock,
+so a run covering many rate limit windows finishes in well under a second::
+
+    python -m benchmarks.pacing --requests 500 --pacing 0.9
+
+The simulated server enforces Riot's fixed windows and reports counts the same
+way the real API does. Other clients sharing the key (``--background``, in
+requests per second) spend from the same windows without the tap seeing them
+until the next response, which is what turns a drained bucket into 429s.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from datetime import datetime, timezone
+from typing import NamedTuple
+from unittest import mock
+
+from benchmarks.rate_windows import format_counts, parse_limits
+from tap_riotapi import rate_limiting
+from tap_riotapi.rate_limiting import RateLimitState, _RateLimitRecord
+
+ROUTING_VALUE = "americas"
+ENDPOINT = "/tft/match/v1/matches/{matchId}"
+
+
+class SimulatedClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SimulatedEndpoint:
+
+    def __init__(self, app_limits: str, method_limits: str):
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self.app = parse_limits(app_limits)
+        self.method = parse_limits(method_limits)
+
+    def handle(self, now: float, *, counts_method: bool = True) -> float | None:
+        """Serve a request, returning ``Retry-After`` seconds if throttled."""
+        windows = self.app + self.method if counts_method else self.app
+        full = [window for window in windows if window.full(now)]
+        if full:
+            return max(window.window_end for window in full) - now
+        for window in windows:
+            window.admit(now)
+        return None
+
+    def headers(self) -> tuple[_RateLimitRecord, _RateLimitRecord]:
+        returned = datetime.now(timezone.utc)
+        return (
+            _RateLimitRecord(returned, self.app_limits, format_counts(self.app)),
+            _RateLimitRecord(returned, self.method_limits, format_counts(self.method)),
+        )
+
+
+class RunResult(NamedTuple):
+
+    mode: str
+    elapsed: float
+    throttled: int
+    longest_stall: float
+    peak_per_second: int
+
+
+def simulate(
+    requests: int,
+    pacing: float | None,
+    *,
+    app_limits: str = "20:1,100:120",
+    method_limits: str = "250:10",
+    latency: float = 0.15,
+    background: float = 0.0,
+    seed: int = 0,
+) -> RunResult:
+    """Send ``requests`` requests the way ``RiotAPIStream._request`` does."""
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    server = SimulatedEndpoint(app_limits, method_limits)
+    next_background = rng.expovariate(background) if background else float("inf")
+    throttled = 0
+    longest_stall = 0.0
+    sent_at: list[float] = []
+
+    def advance(seconds: float):
+        nonlocal next_background
+        target = clock.now + seconds
+        while next_background <= target:
+            server.handle(next_background, counts_method=False)
+            next_background += rng.expovariate(background)
+        clock.now = target
+
+    with mock.patch.object(rate_limiting, "monotonic", clock):
+        limiter = RateLimitState(pacing=pacing)
+        done = 0
+        while done < requests:
+            wait = limiter.request_wait(ROUTING_VALUE, ENDPOINT)
+            longest_stall = max(longest_stall, wait)
+            advance(wait + latency / 2)
+            retry_after = server.handle(clock.now)
+            advance(latency / 2)
+            if retry_after is not None:
+                # Same as generate_wait: Retry-After is whole seconds, plus one.
+                throttled += 1
+                stall = int(retry_after) + 1
+                longest_stall = max(longest_stall, stall)
+                advance(stall)
+                continue
+            sent_at.append(clock.now)
+            app_limit, method_limit = server.headers()
+            limiter.log_response(ROUTING_VALUE, app_limit)
+            limiter.log_response(ROUTING_VALUE, method_limit, endpoint=ENDPOINT)
+            done += 1
+
+    peak = 0
+    start = 0
+    for end, timestamp in enumerate(sent_at):
+        while timestamp - sent_at[start] >= 1:
+            start += 1
+        peak = max(peak, end - start + 1)
+
+    return RunResult(
+        mode=f"paced {pacing:.0%}" if pacing else "burst",
+        elapsed=clock.now,
+        throttled=throttled,
+        longest_stall=longest_stall,
+        peak_per_second=peak,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--pacing", type=float, default=0.9)
+    parser.add_argument("--app-limits", default="20:1,100:120")
+    parser.add_argument("--method-limits", default="250:10")
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--background", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':<12}{'sim seconds':>12}{'req/s':>8}{'429s':>6}"
+        f"{'longest stall':>15}{'peak req in 1s':>16}"
+    )
+    for pacing in (None, args.pacing):
+        result = simulate(
+            args.requests,
+            pacing,
+            app_limits=args.app_limits,
+            method_limits=args.method_limits,
+            latency=args.latency,
+            background=args.background,
+            seed=args.seed,
+        )
+        print(
+            f"{result.mode:<12}{result.elapsed:>12.1f}"
+            f"{args.requests / result.elapsed:>8.2f}{result.throttled:>6}"
+            f"{result.longest_stall:>15.1f}{result.peak_per_second:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Measure the cost and accuracy of the rate limiter's hot path.
+
+``request_wait`` and ``log_response`` run for every request, against the app and
+method buckets of one of 20 routing values. This drives them with synthetic
+header streams across every routing value and a spread of endpoints::
+
+    python -m benchmarks.rate_limiter --calls 200000
+
+and reports, for each call:
+
+* latency (mean, p50 and p99 in nanoseconds);
+* memory (peak traced bytes while running, and bytes still held afterwards);
+
+and, on a simulated clock against a simulated Riot server, how far the waits the
+limiter computes are from the ideal wait, i.e. the shortest wait after which the
+request would be admitted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tracemalloc
+from datetime import datetime, timezone
+from statistics import mean, quantiles
+from time import perf_counter_ns
+from typing import Callable, NamedTuple
+from unittest import mock
+
+from benchmarks.pacing import SimulatedClock
+from benchmarks.rate_windows import Window, format_counts, parse_limits
+from tap_riotapi import rate_limiting
+from tap_riotapi.rate_limiting import RateLimitState, _RateLimitRecord
+from tap_riotapi.utils import REGION_ROUTING_MAP
+
+ROUTING_VALUES = sorted(set(REGION_ROUTING_MAP) | set(REGION_ROUTING_MAP.values()))
+ENDPOINTS = [
+    "/riot/account/v1/accounts/by-riot-id/{gameName}/{tagLine}",
+    "/tft/league/v1/challenger",
+    "/tft/league/v1/grandmaster",
+    "/tft/league/v1/master",
+    "/tft/league/v1/entries/{tier}/{division}",
+    "/tft/match/v1/matches/by-puuid/{puuid}/ids",
+    "/tft/match/v1/matches/{matchId}",
+    "/tft/summoner/v1/summoners/by-puuid/{puuid}",
+]
+APP_LIMITS = "500:10,30000:600"
+METHOD_LIMITS = "2000:10"
+# A development key's limits, which a single client can easily keep full.
+BUSY_APP_LIMITS = "20:1,100:120"
+BUSY_METHOD_LIMITS = "50:10"
+
+
+class Latency(NamedTuple):
+
+    mean_ns: float
+    p50_ns: float
+    p99_ns: float
+
+
+class Memory(NamedTuple):
+
+    peak_bytes: int
+    retained_bytes: int
+
+
+class Accuracy(NamedTuple):
+
+    requests: int
+    mean_error: float
+    p99_error: float
+    early: int
+    throttled: int
+    wasted: float
+
+
+def header_stream(calls: int, seed: int) -> list[tuple]:
+    """Return ``(routing value, endpoint, app record, method record)`` per call."""
+    rng = random.Random(seed)
+    returned = datetime.now(timezone.utc)
+    counts: dict[tuple[str, str], int] = {}
+    stream = []
+    for _ in range(calls):
+        routing_value = rng.choice(ROUTING_VALUES)
+        endpoint = rng.choice(ENDPOINTS)
+        # Counts climb to the cap and wrap, as if the window reset there.
+        app = counts.get((routing_value, "app"), 0) % 500 + 1
+        method = counts.get((routing_value, endpoint), 0) % 2000 + 1
+        counts[routing_value, "app"] = app
+        counts[routing_value, endpoint] = method
+        stream.append(
+            (
+                routing_value,
+                endpoint,
+                _RateLimitRecord(returned, APP_LIMITS, f"{app}:10,{app}:600"),
+                _RateLimitRecord(returned, METHOD_LIMITS, f"{method}:10"),
+            )
+        )
+    return stream
+
+
+def _log(limiter: RateLimitState, routing_value, endpoint, app, method):
+    limiter.log_response(routing_value, app)
+    limiter.log_response(routing_value, method, endpoint=endpoint)
+
+
+def _wait(limiter: RateLimitState, routing_value, endpoint, app, method):
+    limiter.request_wait(routing_value, endpoint)
+
+
+def time_calls(call: Callable, limiter: RateLimitState, stream: list) -> Latency:
+    timings = []
+    for item in stream:
+        start = perf_counter_ns()
+        call(limiter, *item)
+        timings.append(perf_counter_ns() - start)
+    cuts = quantiles(timings, n=100)
+    return Latency(mean(timings), cuts[49], cuts[98])
+
+
+def trace_memory(call: Callable, limiter: RateLimitState, stream: list) -> Memory:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for item in stream:
+            call(limiter, *item)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Memory(peak - before, after - before)
+
+
+class _SimulatedServer:
+    """Riot's windows for every routing value and endpoint, on a simulated clock."""
+
+    def __init__(self, app_limits: str, method_limits: str):
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self._app: dict[str, list[Window]] = {}
+        self._method: dict[tuple[str, str], list[Window]] = {}
+
+    def _windows(self, routing_value: str, endpoint: str) -> tuple[list, list]:
+        app = self._app.setdefault(routing_value, parse_limits(self.app_limits))
+        method = self._method.setdefault(
+            (routing_value, endpoint), parse_limits(self.method_limits)
+        )
+        return app, method
+
+    def ready_at(self, routing_value: str, endpoint: str, now: float) -> float:
+        app, method = self._windows(routing_value, endpoint)
+        full = [window.window_end for window in app + method if window.full(now)]
+        return max(full, default=now)
+
+    def handle(self, routing_value: str, endpoint: str, now: float):
+        app, method = self._windows(routing_value, endpoint)
+        if any(window.full(now) for window in app + method):
+            return None
+        for window in app + method:
+            window.admit(now)
+        returned = datetime.now(timezone.utc)
+        return (
+            _RateLimitRecord(returned, self.app_limits, format_counts(app)),
+            _RateLimitRecord(returned, self.method_limits, format_counts(method)),
+        )
+
+
+def accuracy(
+    requests: int, latency: float, seed: int, pacing: float | None = None
+) -> Accuracy:
+    """Compare the limiter's waits with the ideal waits on a busy key.
+
+    A few routing values and endpoints are hit hard enough under a development
+    key's limits to keep the windows full, so many waits are non-zero.
+    """
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    server = _SimulatedServer(BUSY_APP_LIMITS, BUSY_METHOD_LIMITS)
+    routing_values = ROUTING_VALUES[:3]
+    endpoints = ENDPOINTS[5:7]
+    errors = []
+    early = throttled = 0
+    wasted = 0.0
+
+    with mock.patch.object(rate_limiting, "monotonic", clock):
+        limiter = RateLimitState(pacing=pacing)
+        for _ in range(requests):
+            routing_value = rng.choice(routing_values)
+            endpoint = rng.choice(endpoints)
+            wait = limiter.request_wait(routing_value, endpoint)
+            arrival = clock.now + latency / 2
+            ready = server.ready_at(routing_value, endpoint, arrival)
+            ideal = max(0.0, ready - arrival)
+            errors.append(abs(wait - ideal))
+            if wait < ideal:
+                early += 1
+            else:
+                wasted += wait - ideal
+
+            clock.now += wait + latency / 2
+            records = server.handle(routing_value, endpoint, clock.now)
+            clock.now += latency / 2
+            if records is None:
+                throttled += 1
+                continue
+            limiter.log_response(routing_value, records[0])
+            limiter.log_response(routing_value, records[1], endpoint=endpoint)
+
+    return Accuracy(
+        requests=requests,
+        mean_error=mean(errors),
+        p99_error=quantiles(errors, n=100)[98],
+        early=early,
+        throttled=throttled,
+        wasted=wasted,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--accuracy-requests", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--pacing", type=float)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stream = header_stream(args.calls, args.seed)
+    print(f"{len(ROUTING_VALUES)} routing values, {len(ENDPOINTS)} endpoints")
+    print(
+        f"{'call':<16}{'mean ns':>10}{'p50 ns':>10}{'p99 ns':>10}"
+        f"{'peak KiB':>10}{'kept B':>8}"
+    )
+    for name, call in (("log_response x2", _log), ("request_wait", _wait)):
+        limiter = RateLimitState(pacing=args.pacing)
+        # Warm up, so bucket set-up isn't counted against the steady state.
+        for item in stream:
+            _log(limiter, *item)
+        latency = time_calls(call, limiter, stream)
+        memory = trace_memory(call, limiter, stream)
+        print(
+            f"{name:<16}{latency.mean_ns:>10.0f}{latency.p50_ns:>10.0f}"
+            f"{latency.p99_ns:>10.0f}{memory.peak_bytes / 1024:>10.1f}"
+            f"{memory.retained_bytes:>8}"
+        )
+
+    result = accuracy(args.accuracy_requests, args.latency, args.seed, args.pacing)
+    print()
+    print(f"accuracy over {result.requests} requests, {args.latency}s latency:")
+    print(f"  mean |wait - ideal|   {result.mean_error:.4f}s")
+    print(f"  p99 |wait - ideal|    {result.p99_error:.4f}s")
+    print(f"  waits shorter than ideal  {result.early}")
+    print(f"  429s                      {result.throttled}")
+    print(f"  total time over ideal     {result.wasted:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Riot's fixed rate limit windows, as the simulated servers enforce them."""
+
+from __future__ import annotations
+
+
+class Window:
+    """One of Riot's fixed windows: opened by a request, reset after ``duration``."""
+
+    def __init__(self, cap: int, duration: int):
+        self.cap = cap
+        self.duration = duration
+        self.count = 0
+        self.window_end = 0.0
+
+    def full(self, now: float) -> bool:
+        return now < self.window_end and self.count >= self.cap
+
+    def admit(self, now: float):
+        if now >= self.window_end:
+            self.count = 0
+            self.window_end = now + self.duration
+        self.count += 1
+
+
+def parse_limits(limits: str) -> list[Window]:
+    """Return a window for each ``cap:seconds`` in a rate limit header value."""
+    windows = []
+    for item in limits.split(","):
+        cap, duration = item.split(":")
+        windows.append(Window(int(cap), int(duration)))
+    return windows
+
+
+def format_counts(windows: list[Window]) -> str:
+    """Return the ``count:seconds`` rate limit count header value for ``windows``."""
+    return ",".join(f"{window.count}:{window.duration}" for window in windows)
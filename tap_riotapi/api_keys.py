@@ -0,0 +1,171 @@
+"""API keys pooled together, each with its own rate limits."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from math import inf
+from typing import TYPE_CHECKING
+
+from tap_riotapi.rate_limiting import RateLimitState
+from tap_riotapi.utils import REGION_ROUTING_MAP, StateValue
+
+if TYPE_CHECKING:
+    from tap_riotapi.rate_limiting import _RateLimitRecord
+
+LOGGER = logging.getLogger(__name__)
+
+
+def key_id(token: str) -> str:
+    # Identifies a key in state and logs without giving it away.
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+class RetiredKeyError(Exception):
+    """A request was pinned to an API key that is no longer live."""
+
+
+class ApiKeyPool(StateValue):
+    """API keys to spread requests over, with rate limit buckets for each.
+
+    Riot's app rate limits apply per key, so every key gets its own
+    ``RateLimitState``, and each request goes to the live key that can send it
+    soonest, ties going to the key with the most room left in its windows. A
+    key that gets a 401 or 403 back is retired for the rest of the run, as
+    long as another key is still live.
+
+    Riot encrypts PUUIDs per application, so a request for a PUUID can name
+    the ``key_id`` of the key it was resolved with. It only ever goes out with
+    that key: once the key is retired, or if it's no longer configured,
+    ``request_wait`` raises ``RetiredKeyError`` instead.
+
+    In state, each key's buckets are stored under ``key_id`` of the key.
+    """
+
+    def __init__(self, tokens: list[str], pacing: float | None = None):
+
+        self._lock = threading.Lock()
+        self._rate_limits = {
+            token: RateLimitState(pacing=pacing) for token in dict.fromkeys(tokens)
+        }
+        self._retired: set[str] = set()
+        self._tokens = {key_id(token): token for token in self._rate_limits}
+
+    @classmethod
+    def from_dict(
+        cls, tokens: list[str], state: dict, pacing: float | None = None
+    ) -> ApiKeyPool:
+        pool = cls(tokens, pacing=pacing)
+        routing_values = REGION_ROUTING_MAP.keys() | set(REGION_ROUTING_MAP.values())
+        if state.keys() & routing_values:
+            # States written before keys were pooled hold the first key's buckets.
+            state = {key_id(tokens[0]): state}
+        for token in pool._rate_limits:
+            pool._rate_limits[token] = RateLimitState.from_dict(
+                state.get(key_id(token), {}), pacing=pacing
+            )
+        return pool
+
+    def to_dict(self) -> dict:
+        return {
+            key_id(token): rate_limits.to_dict()
+            for token, rate_limits in self._rate_limits.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._rate_limits) - len(self._retired)
+
+    def is_live(self, key: str) -> bool:
+        """Return whether the key with ``key_id`` ``key`` is pooled and not retired."""
+        token = self._tokens.get(key)
+        with self._lock:
+            return token is not None and token not in self._retired
+
+    def request_wait(
+        self, routing_value: str, endpoint: str, key: str | None = None
+    ) -> tuple[str, float]:
+        """Pick the key to send a request with, returning it and how long to wait.
+
+        With ``key`` given, the key with that ``key_id`` is picked, and
+        ``RetiredKeyError`` is raised if it isn't live.
+        """
+        with self._lock:
+            tokens = self._rate_limits.keys()
+            if key is not None:
+                pinned = self._tokens.get(key)
+                if pinned is None or pinned in self._retired:
+                    raise RetiredKeyError(f"API key {key} is no longer live")
+                tokens = [pinned]
+            best, best_rank = None, None
+            for token in tokens:
+                if token in self._retired:
+                    continue
+                rate_limits = self._rate_limits[token]
+                remaining = rate_limits.remaining(routing_value, endpoint)
+                rank = (
+                    rate_limits.request_wait(routing_value, endpoint, book=False),
+                    -(inf if remaining is None else remaining),
+                )
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = token, rank
+            return best, self._rate_limits[best].request_wait(routing_value, endpoint)
+
+    def log_response(
+        self,
+        token: str,
+        routing_value: str,
+        rate_limit: _RateLimitRecord,
+        endpoint: str | None = None,
+    ):
+        rate_limits = self._rate_limits.get(token)
+        if rate_limits is not None:
+            rate_limits.log_response(routing_value, rate_limit, endpoint=endpoint)
+
+    def settle(
+        self,
+        token: str,
+        routing_value: str,
+        endpoint: str,
+        app_limit: _RateLimitRecord | None = None,
+        method_limit: _RateLimitRecord | None = None,
+    ):
+        """Settle a request sent with ``token``; see ``RateLimitState.settle``."""
+        rate_limits = self._rate_limits.get(token)
+        if rate_limits is not None:
+            rate_limits.settle(routing_value, endpoint, app_limit, method_limit)
+
+    def remaining(self, routing_value: str, endpoint: str) -> int | None:
+        """Return how many more requests to ``endpoint`` the live keys have room for.
+
+        ``None`` until a response has told us any key's limits.
+        """
+        with self._lock:
+            room = [
+                rate_limits.remaining(routing_value, endpoint)
+                for token, rate_limits in self._rate_limits.items()
+                if token not in self._retired
+            ]
+        known = [remaining for remaining in room if remaining is not None]
+        return sum(known) if known else None
+
+    def retire(self, token: str, status_code: int) -> bool:
+        """Retire ``token``, unless it's the last live key.
+
+        Returns whether the request can be retried with another key.
+        """
+        with self._lock:
+            if token not in self._rate_limits:
+                return False
+            if token in self._retired:
+                return len(self) > 0
+            if len(self) == 1:
+                return False
+            self._retired.add(token)
+        LOGGER.warning(
+            "Retiring API key %s after a %d response; %d keys left.",
+            key_id(token),
+            status_code,
+            len(self),
+        )
+        return True
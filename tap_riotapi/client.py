@@ -1,7 +1,9 @@
 """REST client handling, including RiotAPIStream base class."""
 
 from __future__ import annotations
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
 from dateutil import parser
 from time import sleep
 from urllib.parse import urlparse, parse_qs
@@ -9,12 +11,16 @@ from typing import TYPE_CHECKING
 
 from backoff import expo
 from singer_sdk.authenticators import APIKeyAuthenticator
+from singer_sdk.exceptions import RetriableAPIError
 from singer_sdk.helpers._state import write_starting_replication_value
 from singer_sdk.helpers.jsonpath import extract_jsonpath
 from singer_sdk.streams import RESTStream
 from singer_sdk.streams.core import REPLICATION_INCREMENTAL
 
+from tap_riotapi.api_keys import key_id
+from tap_riotapi.pipeline import HISTORY
 from tap_riotapi.rate_limiting import _RateLimitRecord
+from tap_riotapi.utils import API_BASE_URL, response_json
 
 if TYPE_CHECKING:
     import requests
@@ -22,11 +28,48 @@ if TYPE_CHECKING:
     from typing import Any, Callable, Generator, Iterable
 
 
+# Responses that retire the API key they were sent with.
+RETIRED_KEY_STATUSES = (401, 403)
+
+
+def retry_after(rsps: requests.Response) -> float | None:
+
+    try:
+        return float(rsps.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def rate_limit_records(
+    rsps: requests.Response | None,
+) -> tuple[_RateLimitRecord | None, _RateLimitRecord | None]:
+    """Return the app and method rate limits ``rsps`` reported, where it did."""
+    # Responses served from the match detail cache were never counted.
+    if rsps is None or "X-App-Rate-Limit" not in rsps.headers:
+        return None, None
+    timestamp = parser.parse(rsps.headers["Date"])
+    app_limit = _RateLimitRecord(
+        datetime_returned=timestamp,
+        rate_cap=rsps.headers["X-App-Rate-Limit"],
+        rate_count=rsps.headers["X-App-Rate-Limit-Count"],
+    )
+    if "X-Method-Rate-Limit" not in rsps.headers:
+        return app_limit, None
+    return app_limit, _RateLimitRecord(
+        datetime_returned=timestamp,
+        rate_cap=rsps.headers["X-Method-Rate-Limit"],
+        rate_count=rsps.headers["X-Method-Rate-Limit-Count"],
+    )
+
+
 def generate_wait(exception: Any) -> int | None:
 
     rsps = getattr(exception, "response", None)
 
-    if rsps and rsps.status_code == 429 and "Retry-After" in rsps.headers:
+    if rsps is not None and rsps.status_code in RETIRED_KEY_STATUSES:
+        # The key was retired, so retry with another straight away.
+        return 0
+    if rsps is not None and rsps.status_code == 429 and "Retry-After" in rsps.headers:
         try:
             return int(rsps.headers["Retry-After"])+1
         except ValueError:
@@ -48,24 +91,32 @@ class RiotAPIStream(RESTStream):
     @property
     def url_base(self) -> str:
         """Return the API URL root, configurable via tap settings."""
+        url_base = self.config.get("api_base_url") or API_BASE_URL
         if self.routing_type == "regional":
-            return "https://{region_routing_value}.api.riotgames.com"
+            return url_base.replace("{routing_value}", "{region_routing_value}")
         else:
-            return "https://{platform_routing_value}.api.riotgames.com"
+            return url_base.replace("{routing_value}", "{platform_routing_value}")
+
+    @property
+    def requests_session(self) -> requests.Session:
+        """Return the session shared by every stream of the tap."""
+        return self._tap.http_session
 
     @property
     def authenticator(self) -> APIKeyAuthenticator:
-        """Return a new authenticator object.
+        """Return the authenticator shared by every stream, creating it on first use.
 
         Returns:
             An authenticator instance.
         """
-        return APIKeyAuthenticator.create_for_stream(
-            self,
-            key="X-Riot-Token",
-            value=self.config.get("auth_token", ""),
-            location="header",
-        )
+        if self._tap.authenticator is None:
+            self._tap.authenticator = APIKeyAuthenticator.create_for_stream(
+                self,
+                key="X-Riot-Token",
+                value=self.config.get("auth_token", ""),
+                location="header",
+            )
+        return self._tap.authenticator
 
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
         """Parse the response and return an iterator of result records.
@@ -76,23 +127,20 @@ class RiotAPIStream(RESTStream):
         Yields:
             Each record from the source.
         """
-        timestamp = parser.parse(response.headers["Date"])
-
-        app_rate_limit = _RateLimitRecord(
-            datetime_returned=timestamp,
-            rate_cap=response.headers["X-App-Rate-Limit"],
-            rate_count=response.headers["X-App-Rate-Limit-Count"],
-        )
-        method_rate_limit = _RateLimitRecord(
-            datetime_returned=timestamp,
-            rate_cap=response.headers["X-Method-Rate-Limit"],
-            rate_count=response.headers["X-Method-Rate-Limit-Count"],
-        )
+        rate_limits = {}
+        app_limit, method_limit = rate_limit_records(response)
+        if app_limit is not None:
+            rate_limits["app_rate_limit"] = app_limit
+        if method_limit is not None:
+            rate_limits["method_rate_limit"] = method_limit
         url_params = parse_qs(urlparse(response.request.url).query)
+        # PUUIDs in the response are encrypted for the key it was sent with.
+        token = response.request.headers.get("X-Riot-Token")
+        api_key_id = key_id(token) if token else None
 
         data_iter = extract_jsonpath(
             self.records_jsonpath,
-            input=response.json(),
+            input=response_json(response, fast=self.config.get("fast_json", False)),
         )
 
         try:
@@ -101,13 +149,16 @@ class RiotAPIStream(RESTStream):
             first_record = None
         yield {
             "data": first_record,
-            "method_rate_limit": method_rate_limit,
-            "app_rate_limit": app_rate_limit,
             "url_params_used": url_params,
-        }
+            "api_key_id": api_key_id,
+        } | rate_limits
 
         for record in data_iter:
-            yield {"data": record, "url_params_used": url_params}
+            yield {
+                "data": record,
+                "url_params_used": url_params,
+                "api_key_id": api_key_id,
+            }
 
     def post_process(
         self,
@@ -123,13 +174,15 @@ class RiotAPIStream(RESTStream):
         Returns:
             The updated record dictionary, or ``None`` to skip the record.
         """
+        # The key pool logged the counts as soon as the response came back.
+        telemetry = self._tap.rate_limit_telemetry
         if "app_rate_limit" in row.keys():
-            self.tap_state["rate_limits"].log_response(
+            telemetry.log_response(
                 routing_value=self.routing_value(context),
                 rate_limit=row["app_rate_limit"],
             )
         if "method_rate_limit" in row.keys():
-            self.tap_state["rate_limits"].log_response(
+            telemetry.log_response(
                 routing_value=self.routing_value(context),
                 rate_limit=row["method_rate_limit"],
                 endpoint=self.path,
@@ -141,18 +194,184 @@ class RiotAPIStream(RESTStream):
             return {"data": row["data"], "url_params_used": row["url_params_used"]}
         return row["data"]
 
+    def _write_record_message(self, record: dict) -> None:
+        super()._write_record_message(record)
+        self._tap.state_writer.record_written()
+
+    def _write_state_message(self) -> None:
+        """Hand pending state to the tap's state writer.
+
+        The writer decides when the STATE message goes out and what it holds.
+        """
+        if not self._is_state_flushed:
+            self._tap.state_writer.mark_dirty(self.name)
+            self._is_state_flushed = True
+        self._tap.state_writer.write()
+
+    def finalize_state_progress_markers(self, state: dict | None = None) -> None:
+        """Finalize state, closing a top-level stream with a full, compact state.
+
+        Rate limit telemetry and connection reuse so far are reported at the end
+        of each top-level stream, so the last report covers the whole run, and
+        so is the stream's profile when profiling.
+
+        Args:
+            state: State object to promote progress markers with.
+        """
+        if self.parent_stream_type is not None:
+            super().finalize_state_progress_markers(state)
+            return
+
+        profiler = self._tap.profiler
+        with profiler.profile(self.name) if profiler else nullcontext():
+            with self._tap.state_writer.closing():
+                super().finalize_state_progress_markers(state)
+        self._tap.rate_limit_telemetry.report()
+        self._tap.http_session.report()
+        if profiler:
+            profiler.write_report(self.name)
+
+    def request_decorator(self, func: Callable) -> Callable:
+        decorated_request = super().request_decorator(func)
+        lanes = self._tap.lane_executor
+        if lanes is None:
+            return decorated_request
+
+        def unlocked_request(*args, **kwargs):
+            # Retries and their backoff sleeps happen in here too, so a 429 on
+            # one lane doesn't hold up the others.
+            with lanes.unlocked():
+                return decorated_request(*args, **kwargs)
+
+        return unlocked_request
+
+    def validate_response(self, response: requests.Response) -> None:
+        """Validate the response, retiring the API key it was sent with on a 401/403.
+
+        Args:
+            response: The HTTP ``requests.Response`` object.
+
+        Raises:
+            RetriableAPIError: If the key was retired and another is left to retry with.
+        """
+        if response.status_code in RETIRED_KEY_STATUSES and self.tap_state[
+            "rate_limits"
+        ].retire(response.request.headers["X-Riot-Token"], response.status_code):
+            raise RetriableAPIError(self.response_error_message(response), response)
+        super().validate_response(response)
+
     def _request(
         self,
         prepared_request: requests.PreparedRequest,
         context: Context | None,
     ) -> requests.Response:
 
-        sleep(
-            self.tap_state["rate_limits"].request_wait(
-                self.routing_value(context), self.path
+        routing_value = self.routing_value(context)
+        telemetry = self._tap.rate_limit_telemetry
+        lanes = self._tap.lane_executor
+        # Only lanes take the gate. Ladder prefetch threads send on behalf of a
+        # lane that's waiting for them, and bound themselves by the room left in
+        # the buckets.
+        gated = lanes is not None and lanes.in_lane
+        with lanes.gate(routing_value, self.path) if gated else nullcontext():
+            # A PUUID only decrypts with the key that it was resolved with.
+            pinned_key = None
+            if context and "{puuid}" in self.path:
+                pinned_key = context.get("api_key_id")
+            pool = self.tap_state["rate_limits"]
+            token, wait = pool.request_wait(routing_value, self.path, key=pinned_key)
+            prepared_request.headers["X-Riot-Token"] = token
+            telemetry.log_request(routing_value, self.path, wait)
+            # The request counts against the buckets until it's settled, which
+            # is what keeps gates sending side by side from overshooting a cap.
+            rsps = None
+            try:
+                sleep(wait)
+                self._tap.run_budget.spend()
+                rsps = super()._request(prepared_request, context)
+                return rsps
+            except RetriableAPIError as exception:
+                rsps = exception.response
+                if rsps is not None and rsps.status_code == 429:
+                    telemetry.log_throttled(
+                        routing_value, self.path, retry_after(rsps)
+                    )
+                raise
+            finally:
+                pool.settle(
+                    token, routing_value, self.path, *rate_limit_records(rsps)
+                )
+
+    def _sync_records(
+        self,
+        context: Context | None = None,
+        *,
+        write_messages: bool = True,
+    ) -> Generator[dict, Any, Any]:
+        """Sync records, handing partitions to the lane executor if enabled.
+
+        Once a top-level stream is done, any children it held back are synced,
+        and then any match details its descendants queued up are fetched. A
+        top-level stream is profiled throughout when ``profile_dir`` is set.
+
+        Args:
+            context: Stream partition or context dictionary.
+            write_messages: Whether to write Singer messages to stdout.
+
+        Yields:
+            Each record from the source, when syncing serially.
+        """
+        profiler = self._tap.profiler
+        top_level = context is None and self.parent_stream_type is None
+        with profiler.profile(self.name) if profiler and top_level else nullcontext():
+            lanes = self._tap.lane_executor
+            partitions = self.partitions if context is None else None
+            if lanes is None or not partitions:
+                yield from super()._sync_records(
+                    context, write_messages=write_messages
+                )
+            else:
+                lanes.run_partitions(self, partitions, write_messages=write_messages)
+                self._finalize_state(self.stream_state)
+                if write_messages:
+                    self._write_state_message()
+
+            if context is None:
+                self._sync_deferred_children()
+                self.tap_state["match_detail_queue"].drain()
+
+    def _sync_deferred_children(self) -> None:
+        """Sync any child contexts held back until the stream's partitions are done."""
+
+    def get_records(self, context: Context | None) -> Iterable[dict[str, Any]]:
+        # Partitions not started before the run budget ran out are left for the
+        # next run; top-level streams keep no bookmarks to lose. Child streams
+        # are stopped before their sync starts instead, see _sync_children.
+        # Without a context, a top-level stream has no partitions to sync,
+        # e.g. none in this shard.
+        if self.parent_stream_type is None and (
+            context is None or self._tap.run_budget.exhausted
+        ):
+            return
+        yield from super().get_records(context)
+
+    def _sync_children(self, child_context: Context | None) -> None:
+        if self._tap.run_budget.exhausted:
+            return
+        pipeline = self._tap.pipeline
+        if pipeline is not None and self.parent_stream_type is None and child_context:
+            # The budget is checked again once the history stage gets to it.
+            pipeline.submit(
+                HISTORY,
+                child_context["region_routing_value"],
+                partial(self._sync_children_now, child_context),
             )
-        )
-        return super()._request(prepared_request, context)
+            return
+        super()._sync_children(child_context)
+
+    def _sync_children_now(self, child_context: Context) -> None:
+        if not self._tap.run_budget.exhausted:
+            super()._sync_children(child_context)
 
     def backoff_runtime(  # noqa: PLR6301
         self,
@@ -163,7 +382,7 @@ class RiotAPIStream(RESTStream):
         backup_gen = expo(factor=2, base=4)
         backup_gen.send(None)
         while True:
-            if result := value(exception):
+            if (result := value(exception)) is not None:
                 exception = yield result
             else:
                 yield from backup_gen
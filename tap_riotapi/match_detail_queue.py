@@ -0,0 +1,145 @@
+"""Tap-wide queue of match details waiting to be fetched."""
+
+from __future__ import annotations
+
+from functools import partial
+from typing import TYPE_CHECKING
+
+from tap_riotapi.pipeline import DETAILS
+from tap_riotapi.utils import StateValue
+
+if TYPE_CHECKING:
+    from singer_sdk.helpers.types import Context
+
+    from tap_riotapi.tap import TapRiotAPI
+
+
+class MatchDetailQueue(StateValue):
+    """Match IDs discovered by any match history stream, fetched once each.
+
+    History streams hand every match they find to the queue instead of syncing
+    its detail stream inline. A match is queued once per run no matter how many
+    of its lobby's players turn up, and is skipped outright if an earlier run
+    already fetched it. Pending matches are grouped by region and drained a batch
+    at a time, either when a region's batch fills up or when a top-level stream
+    finishes, so the match detail budget is only spent on unique matches.
+
+    The queue is kept in tap state, so matches whose history was already
+    bookmarked are still fetched if the run stops before they are drained,
+    including when draining stops because the run budget is exhausted.
+
+    In pipeline mode, each region's matches are fetched by the pipeline's
+    details stage as soon as they're queued, and ``batch_size`` bounds how far
+    the match histories may run ahead of it instead.
+    """
+
+    def __init__(self, tap: TapRiotAPI, batch_size: int = 100):
+
+        self._tap = tap
+        self.batch_size = batch_size
+        # region -> matchId -> (detail stream name, child context)
+        self._pending: dict[str, dict[str, tuple[str, Context]]] = {}
+        self._queued: set[str] = set()
+        self._draining: set[str] = set()
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self._queued
+
+    def __len__(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+    def to_dict(self) -> dict:
+        return {
+            region: [
+                {"stream": stream_name, "context": context}
+                for stream_name, context in batch.values()
+            ]
+            for region, batch in self._pending.items()
+            if batch
+        }
+
+    @classmethod
+    def from_dict(
+        cls, state: dict, tap: TapRiotAPI, batch_size: int = 100
+    ) -> MatchDetailQueue:
+        queue = cls(tap, batch_size=batch_size)
+        for region, items in state.items():
+            batch = queue._pending.setdefault(region, {})
+            for item in items:
+                batch[item["context"]["matchId"]] = (item["stream"], item["context"])
+                queue._queued.add(item["context"]["matchId"])
+        return queue
+
+    def add(self, stream_name: str, context: Context) -> None:
+        """Queue a match for ``stream_name`` unless it's known already."""
+        match_id = context["matchId"]
+        if match_id in self._queued or match_id in self._tap.state["match_detail_set"]:
+            return
+
+        self._queued.add(match_id)
+        region = context["region_routing_value"]
+        batch = self._pending.setdefault(region, {})
+        batch[match_id] = (stream_name, context)
+        pipeline = self._tap.pipeline
+        if pipeline is not None:
+            # The region's details worker fetches matches as they come in, and
+            # the history stage waits while a full batch is ahead of it.
+            self._schedule(region)
+            pipeline.wait_until(
+                lambda: len(batch) < self.batch_size or region not in self._draining
+            )
+            return
+        # Another lane may already be draining this region, in which case it
+        # will pick this match up before it finishes.
+        if len(batch) >= self.batch_size and region not in self._draining:
+            self._drain_region(region)
+
+    def drain(self) -> None:
+        """Fetch every pending match, running regions side by side if possible."""
+        regions = [region for region, batch in self._pending.items() if batch]
+        pipeline = self._tap.pipeline
+        if pipeline is not None:
+            with pipeline.lane():
+                for region in regions:
+                    self._schedule(region)
+            pipeline.join()
+            return
+
+        lanes = self._tap.lane_executor
+        if lanes is None or lanes.in_lane or len(regions) < 2:
+            for region in regions:
+                self._drain_region(region)
+            return
+
+        lanes.run_lanes(
+            {region: [partial(self._drain_region, region)] for region in regions},
+            name="match_detail",
+        )
+
+    def _schedule(self, region: str) -> None:
+        # Hands the region to the pipeline's details stage, unless it has it.
+        if region not in self._draining:
+            self._draining.add(region)
+            self._tap.pipeline.submit(
+                DETAILS, region, partial(self._drain_region, region)
+            )
+
+    def _drain_region(self, region: str) -> None:
+        batch = self._pending.get(region, {})
+        budget = self._tap.run_budget
+        pipeline = self._tap.pipeline
+        self._draining.add(region)
+        try:
+            while batch and not budget.exhausted:
+                match_id, (stream_name, context) = next(iter(batch.items()))
+                stream = self._tap.streams.get(stream_name)
+                if stream is not None:
+                    stream.sync(context=context)
+                # Only dropped once fetched, so a STATE written mid-drain keeps it.
+                del batch[match_id]
+                if pipeline is not None:
+                    pipeline.notify()
+        finally:
+            self._draining.discard(region)
+            if pipeline is not None:
+                pipeline.notify()
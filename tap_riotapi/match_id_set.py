@@ -0,0 +1,154 @@
+"""Compact set of match IDs for tap state."""
+
+from __future__ import annotations
+
+import sys
+import zlib
+from array import array
+from base64 import b64decode, b64encode
+from bisect import bisect_left
+from datetime import date, datetime, timezone
+from itertools import accumulate, chain
+from typing import Iterable
+
+from tap_riotapi.utils import StateValue
+
+
+def _split(match_id: str) -> tuple[str, int]:
+    prefix, _, number = match_id.rpartition("_")
+    return prefix, int(number)
+
+
+def _encode(numbers: Iterable[int]) -> str:
+    ordered = sorted(numbers)
+    deltas = array("Q", (b - a for a, b in zip(chain([0], ordered), ordered)))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return b64encode(zlib.compress(deltas.tobytes())).decode("ascii")
+
+
+def _decode(encoded: str) -> array:
+    deltas = array("Q")
+    deltas.frombytes(zlib.decompress(b64decode(encoded)))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return array("Q", accumulate(deltas))
+
+
+class MatchIdSet(StateValue):
+    """Set of match IDs like ``NA1_5012345678``, keyed by platform prefix.
+
+    In state, each platform holds one entry per day matches were added, mapping
+    to the sorted numeric IDs delta-encoded, zlib-compressed and base64-encoded.
+    Riot hands out match IDs in order, so the deltas are small and the entries
+    shrink to a few bytes per match. Days before the sync's start date are
+    evicted, since history requests never reach back that far again.
+
+    Entries loaded from state are encoded once and never again; lookups go
+    through one sorted array per platform. Only matches added during this run
+    are re-encoded for STATE messages, and only when they've changed.
+    """
+
+    def __init__(self, today: str | None = None):
+
+        self._today = today or datetime.now(timezone.utc).date().isoformat()
+        # platform -> day added -> encoded IDs, for days before today
+        self._encoded: dict[str, dict[str, str]] = {}
+        # platform -> sorted IDs from every day in _encoded
+        self._loaded: dict[str, array] = {}
+        # platform -> IDs added today
+        self._added: dict[str, set[int]] = {}
+        self._added_encoded: dict[str, str] = {}
+        # IDs added since the last take_new(), once new IDs are being tracked
+        self._new: list[str] | None = None
+
+    @classmethod
+    def from_dict(cls, state: dict[str, dict[str, str]]) -> MatchIdSet:
+        match_ids = cls()
+        for prefix, days in state.items():
+            for day, encoded in days.items():
+                if day == match_ids._today:
+                    match_ids._added.setdefault(prefix, set()).update(_decode(encoded))
+                else:
+                    match_ids._encoded.setdefault(prefix, {})[day] = encoded
+        match_ids._index()
+        return match_ids
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[str]) -> MatchIdSet:
+        match_ids = cls()
+        for match_id in ids:
+            match_ids.add(match_id)
+        return match_ids
+
+    def to_dict(self) -> dict[str, dict[str, str]]:
+        state = {prefix: dict(days) for prefix, days in self._encoded.items()}
+        for prefix, numbers in self._added.items():
+            if prefix not in self._added_encoded:
+                self._added_encoded[prefix] = _encode(numbers)
+            state.setdefault(prefix, {})[self._today] = self._added_encoded[prefix]
+        return state
+
+    def __contains__(self, match_id: str) -> bool:
+        try:
+            prefix, number = _split(match_id)
+        except ValueError:
+            return False
+        if number in self._added.get(prefix, ()):
+            return True
+        loaded = self._loaded.get(prefix)
+        if not loaded:
+            return False
+        index = bisect_left(loaded, number)
+        return index < len(loaded) and loaded[index] == number
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._loaded.values()) + sum(
+            len(ids) for ids in self._added.values()
+        )
+
+    def add(self, match_id: str) -> None:
+        if match_id in self:
+            return
+        prefix, number = _split(match_id)
+        self._added.setdefault(prefix, set()).add(number)
+        self._added_encoded.pop(prefix, None)
+        if self._new is not None:
+            self._new.append(match_id)
+
+    def take_new(self) -> list[str]:
+        """Return the IDs added since the last call, and start tracking them."""
+        new, self._new = self._new or [], []
+        return new
+
+    def evict_before(self, horizon: date) -> None:
+        """Drop every day of IDs added before ``horizon``."""
+        cutoff = horizon.isoformat()
+        self._encoded = {
+            prefix: {day: encoded for day, encoded in days.items() if day >= cutoff}
+            for prefix, days in self._encoded.items()
+        }
+        self._encoded = {prefix: days for prefix, days in self._encoded.items() if days}
+        self._index()
+
+    def _index(self) -> None:
+        self._loaded = {
+            prefix: array("Q", sorted(chain.from_iterable(map(_decode, days.values()))))
+            for prefix, days in self._encoded.items()
+            if days
+        }
+
+
+def union_match_id_dicts(states: Iterable[dict[str, dict[str, str]]]) -> dict:
+    """Return the union of match ID sets in their ``to_dict`` form."""
+    numbers: dict[str, dict[str, set[int]]] = {}
+    for state in states:
+        for prefix, days in state.items():
+            for day, encoded in days.items():
+                numbers.setdefault(prefix, {}).setdefault(day, set()).update(
+                    _decode(encoded)
+                )
+    return {
+        prefix: {day: _encode(ids) for day, ids in days.items()}
+        for prefix, days in numbers.items()
+    }
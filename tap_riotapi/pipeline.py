@@ -0,0 +1,149 @@
+"""Pipelined syncing, running the ladder, history and detail stages side by side."""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+
+from tap_riotapi.concurrency import RoutingLaneExecutor
+
+if TYPE_CHECKING:
+    from typing import Callable
+
+    from tap_riotapi.profiling import SyncProfiler
+
+HISTORY = "history"
+DETAILS = "details"
+
+
+class SyncPipeline(RoutingLaneExecutor):
+    """Sync each stage of the tap on its own workers, joined by bounded queues.
+
+    Top-level partitions run on lanes as with ``concurrent_sync``, but the
+    match histories of the players they find are handed to a ``history``
+    worker per region instead of being synced inline, and the matches those
+    turn up are fetched by a ``details`` worker per region as they arrive. The
+    stages spend from different method rate limits, so a region's app limit
+    keeps being used while any one of them waits on its method limit, and
+    requests of different stages don't wait on each other's gates.
+
+    A full stage queue blocks whoever is submitting to it, so the ladder never
+    runs more than ``history_queue_size`` players ahead of their histories, nor
+    a history more than the match detail batch size ahead of the details.
+
+    Every worker is a lane, so stream code still runs under ``sync_lock`` and
+    messages come out whole; only records of different streams interleave.
+    ``join`` waits for every stage to empty before a top-level stream finalizes
+    its state.
+    """
+
+    def __init__(
+        self, profiler: SyncProfiler | None = None, history_queue_size: int = 100
+    ) -> None:
+        super().__init__(profiler=profiler)
+        self.queue_sizes = {HISTORY: history_queue_size, DETAILS: None}
+        self._changed = threading.Condition(self.sync_lock)
+        # (stage, region) -> jobs waiting for that stage's worker in the region
+        self._queues: dict[tuple[str, str], deque[Callable[[], None]]] = {}
+        self._workers: dict[tuple[str, str], threading.Thread] = {}
+        self._closing = False
+        self._error: BaseException | None = None
+        self._gate_lock = threading.Lock()
+        self._endpoint_gates: dict[tuple[str, str], threading.Lock] = {}
+
+    def run_partitions(self, *args, **kwargs) -> None:
+        super().run_partitions(*args, **kwargs)
+        self.join()
+
+    def run_lanes(self, *args, **kwargs) -> None:
+        super().run_lanes(*args, **kwargs)
+        self.join()
+
+    def submit(self, stage: str, region: str, job: Callable[[], None]) -> None:
+        """Queue ``job`` for ``stage`` in ``region``, waiting while the queue is full.
+
+        Must be called from a lane.
+        """
+        key = (stage, region)
+        jobs = self._queues.setdefault(key, deque())
+        limit = self.queue_sizes[stage]
+        self.wait_until(lambda: limit is None or len(jobs) < limit)
+        jobs.append(job)
+        if key not in self._workers:
+            worker = threading.Thread(
+                target=self._run_worker,
+                args=(key,),
+                name=f"{stage}-{region}",
+                daemon=True,
+            )
+            self._workers[key] = worker
+            worker.start()
+        self._changed.notify_all()
+
+    def wait_until(self, predicate: Callable[[], bool]) -> None:
+        """Let other lanes run until ``predicate`` holds. Must be called from a lane."""
+        while not predicate():
+            self._raise_error()
+            self._changed.wait()
+        self._raise_error()
+
+    def notify(self) -> None:
+        """Wake lanes waiting on a stage. Must be called from a lane."""
+        self._changed.notify_all()
+
+    def join(self) -> None:
+        """Wait for every stage's queue to empty and its workers to finish.
+
+        Re-raises the first error a worker hit.
+        """
+        with self._changed:
+            self._closing = True
+            self._changed.notify_all()
+            try:
+                while self._workers:
+                    self._changed.wait()
+            finally:
+                self._closing = False
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def gate(self, routing_value: str, endpoint: str | None = None) -> threading.Lock:
+        """Return the lock serialising requests to ``endpoint`` on ``routing_value``.
+
+        Stages call different endpoints, so they don't hold each other up. The
+        app limit buckets they share count each other's requests in flight, so
+        sending side by side doesn't overshoot it.
+        """
+        key = (routing_value, endpoint or "")
+        with self._gate_lock:
+            gate = self._endpoint_gates.get(key)
+            if gate is None:
+                gate = self._endpoint_gates[key] = threading.Lock()
+            return gate
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("A pipeline stage failed.") from self._error
+
+    def _run_worker(self, key: tuple[str, str]) -> None:
+        jobs = self._queues[key]
+        with self.lane():
+            try:
+                while self._error is None and not self._abort.is_set():
+                    if not jobs:
+                        if self._closing:
+                            return
+                        self._changed.wait()
+                        continue
+                    job = jobs.popleft()
+                    self._changed.notify_all()
+                    job()
+            except BaseException as error:  # noqa: BLE001
+                self._error = error
+                self._abort.set()
+                jobs.clear()
+            finally:
+                del self._workers[key]
+                self._changed.notify_all()
@@ -0,0 +1,183 @@
+"""Profiling of top-level stream syncs, broken down by hot path."""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+LOGGER = logging.getLogger(__name__)
+
+# From Python 3.12, cProfile hooks into sys.monitoring, which is shared by the
+# whole interpreter: one profiler sees every thread, and no second one can be
+# enabled while it runs.
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+# Phase -> (file name suffix or "" for any, function names). A function's time
+# counts towards a phase unless it was called from within that phase already,
+# e.g. a mixin's ``post_process`` calling the base class's.
+PHASES = {
+    "network wait": ("requests/sessions.py", {"send"}),
+    "rate limit sleep": ("~", {"<built-in method time.sleep>"}),
+    # Lanes waiting for the sync lock, and the main thread waiting for lanes.
+    "lock wait": ("~", {"<method 'acquire' of '_thread.lock' objects>"}),
+    "JSON decode": ("tap_riotapi/utils.py", {"response_json"}),
+    "post_process": ("", {"post_process"}),
+    "state bookkeeping": (
+        "",
+        {
+            "_increment_stream_state",
+            "_finalize_state",
+            "_write_state_message",
+            "finalize_state_progress_markers",
+        },
+    ),
+    "message serialisation": ("", {"_write_record_message"}),
+}
+
+# Built-ins that block rather than compute, left out of the hot spot listing.
+_BLOCKING = (
+    "time.sleep",
+    "'acquire' of '_thread",
+    "'recv_into' of '_socket",
+    "'sendall' of '_socket",
+    "'connect' of '_socket",
+    "select.",
+    "'wait' of",
+)
+
+
+class SyncProfiler:
+    """Deterministic profiles of each top-level stream's sync.
+
+    Everything a top-level stream does, including its child streams and the
+    match details it queued up, is profiled with ``cProfile``. With
+    ``concurrent_sync``, each lane thread is profiled too and its stats merged in;
+    from Python 3.12 the stream's profiler sees the lanes itself, see
+    ``PROCESS_WIDE``.
+
+    ``write_report`` writes, per stream, ``<stream>.prof`` for pstats, snakeviz
+    and the like, and ``<stream>.txt`` splitting the profiled time into ``PHASES``
+    followed by the top functions by own time, leaving out blocking built-ins so
+    that waiting on sleeps and sockets doesn't hide the CPU hot spots.
+    """
+
+    def __init__(self, directory: str | Path, top: int = 30):
+
+        self._directory = Path(directory)
+        self.top = top
+        self._lock = threading.Lock()
+        self._stats: dict[str, pstats.Stats] = {}
+        self._current: str | None = None
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profile the current thread, adding to the stats for ``name``."""
+        profile = cProfile.Profile()
+        outer, self._current = self._current, name
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, e.g. the tap was run under one.
+            LOGGER.warning(
+                "Not profiling %s, as another profiler is already active.", name
+            )
+            self._current = outer
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._current = outer
+            self._add(name, profile)
+
+    @contextmanager
+    def lane(self) -> Iterator[None]:
+        """Profile a lane thread towards the stream currently being profiled."""
+        if self._current is None or PROCESS_WIDE:
+            yield
+            return
+        with self.profile(self._current):
+            yield
+
+    def _add(self, name: str, profile: cProfile.Profile) -> None:
+        profile.create_stats()
+        if not profile.stats:
+            return
+        with self._lock:
+            if name in self._stats:
+                self._stats[name].add(profile)
+            else:
+                self._stats[name] = pstats.Stats(profile)
+
+    def phases(self, name: str) -> dict[str, float]:
+        """Return the seconds spent in each phase, and in none of them."""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                return {}
+            times = {phase: 0.0 for phase in PHASES}
+            for function, (_, _, _, cumulative, callers) in stats.stats.items():
+                phase = _phase(function)
+                if phase is None:
+                    continue
+                if not callers:
+                    times[phase] += cumulative
+                for caller, edge in callers.items():
+                    if _phase(caller) != phase:
+                        times[phase] += edge[3]
+            times["other"] = max(0.0, stats.total_tt - sum(times.values()))
+            return times
+
+    def write_report(self, name: str) -> None:
+        """Write the profile and the phase breakdown for ``name``."""
+        times = self.phases(name)
+        if not times:
+            return
+        total = sum(times.values())
+        lines = [f"{name}: {total:.3f}s profiled", ""]
+        for phase, seconds in times.items():
+            share = seconds / total if total else 0.0
+            lines.append(f"{phase:<24}{seconds:>10.3f}s{share:>8.1%}")
+
+        with self._lock:
+            stats = self._stats[name]
+            stats.dump_stats(self._directory / f"{name}.prof")
+            hot = sorted(
+                (
+                    (own, cumulative, calls, function)
+                    for function, (_, calls, own, cumulative, _) in stats.stats.items()
+                    if not any(blocking in function[2] for blocking in _BLOCKING)
+                ),
+                reverse=True,
+            )[: self.top]
+        lines += [
+            "",
+            f"Top {self.top} functions by own time, excluding waits:",
+            f"{'own s':>10}{'cum s':>10}{'calls':>10}  function",
+        ]
+        for own, cumulative, calls, function in hot:
+            lines.append(
+                f"{own:>10.3f}{cumulative:>10.3f}{calls:>10}  "
+                f"{pstats.func_std_string(function)}"
+            )
+
+        (self._directory / f"{name}.txt").write_text("\n".join(lines) + "\n")
+
+
+def _phase(function: tuple[str, int, str]) -> str | None:
+    file_name, _, function_name = function
+    for phase, (suffix, names) in PHASES.items():
+        if function_name in names and file_name.endswith(suffix):
+            return phase
+    return None
@@ -0,0 +1,84 @@
+"""Riot ID to PUUID cache for tap state."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+from tap_riotapi.utils import StateValue
+
+
+def riot_id(game_name: str, tag_line: str) -> str:
+    # Riot IDs are case-insensitive.
+    return f"{game_name}#{tag_line}".lower()
+
+
+class PuuidCache(StateValue):
+    """PUUIDs of followed players, keyed by Riot ID.
+
+    A Riot ID rarely moves to another account, so a player only needs looking
+    up again once their entry is ``ttl_days`` old, or on every run with
+    ``refresh`` set. In state, each Riot ID maps to ``[puuid, day resolved,
+    key_id]``, the last being the API key the PUUID is encrypted for; entries
+    past their TTL are dropped when loaded.
+    """
+
+    def __init__(self, ttl_days: int = 30, refresh: bool = False):
+
+        self.ttl_days = ttl_days
+        self.refresh = refresh
+        self._today = datetime.now(timezone.utc).date()
+        # Riot ID -> [puuid, ISO day resolved, key_id], without the key_id
+        # in states written before keys were tracked
+        self._entries: dict[str, list[str]] = {}
+        # entries resolved since the last take_new(), once they're being tracked
+        self._new: dict[str, list[str]] | None = None
+
+    @classmethod
+    def from_dict(
+        cls, state: dict[str, list[str]], ttl_days: int = 30, refresh: bool = False
+    ) -> PuuidCache:
+        cache = cls(ttl_days=ttl_days, refresh=refresh)
+        horizon = (cache._today - timedelta(days=ttl_days)).isoformat()
+        cache._entries = {
+            key: entry for key, entry in state.items() if entry[1] > horizon
+        }
+        return cache
+
+    def to_dict(self) -> dict[str, list[str]]:
+        return dict(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, game_name: str, tag_line: str) -> str | None:
+        """Return the cached PUUID for a Riot ID, or ``None`` if it's due a lookup."""
+        if self.refresh:
+            return None
+        entry = self._entries.get(riot_id(game_name, tag_line))
+        return entry[0] if entry else None
+
+    def api_key_id(self, game_name: str, tag_line: str) -> str | None:
+        """Return the ``key_id`` of the API key a cached PUUID was resolved with."""
+        entry = self._entries.get(riot_id(game_name, tag_line))
+        return entry[2] if entry and len(entry) > 2 else None
+
+    def put(
+        self,
+        game_name: str,
+        tag_line: str,
+        puuid: str,
+        api_key_id: str | None = None,
+        day: date | None = None,
+    ):
+        entry = [puuid, (day or self._today).isoformat()]
+        if api_key_id is not None:
+            entry.append(api_key_id)
+        key = riot_id(game_name, tag_line)
+        self._entries[key] = entry
+        if self._new is not None:
+            self._new[key] = entry
+
+    def take_new(self) -> dict[str, list[str]]:
+        """Return the entries resolved since the last call, and start tracking them."""
+        new, self._new = self._new or {}, {}
+        return new
@@ -1,52 +1,104 @@
-from collections import deque
+import threading
 from datetime import datetime, timedelta, timezone
-from math import remainder
+from time import monotonic
 from typing import NamedTuple
 
-from sqlalchemy.event import remove
-
-from tap_riotapi.utils import REGION_ROUTING_MAP
+from tap_riotapi.utils import REGION_ROUTING_MAP, StateValue
 
 
 class RateLimitBucket:
+    """A single ``cap:duration`` limit, tracked on the monotonic clock.
+
+    Riot opens a window with the first request counted against a limit, resets it
+    ``duration`` seconds later, and reports the running count in the window on
+    every response. The bucket mirrors that: ``count`` is the highest count Riot
+    reported and ``window_end`` is when we expect the window to reset.
+
+    ``in_flight`` is how many requests have been sent but not answered yet, so
+    requests sent side by side don't all see room for one more. Their responses
+    can come back out of order, so a lower count only means the window was reset
+    if it's no higher than ``floor``, the count when the oldest of them was sent.
+
+    When pacing, ``utilisation`` is the fraction of ``cap`` to aim for and
+    ``next_send`` is the earliest time the next request may go out.
+    """
+
+    __slots__ = (
+        "cap",
+        "count",
+        "duration",
+        "floor",
+        "in_flight",
+        "next_send",
+        "utilisation",
+        "window_end",
+    )
 
     def __init__(self, duration: int, cap: int):
 
         self.duration = duration
-        self.reported_request_count = 0
-        self._request_log: deque[datetime] = deque(maxlen=cap)
-
-    def log_request(self, req_timestamp: datetime | None = None):
-        if req_timestamp is None:
-            req_timestamp = datetime.now(timezone.utc).astimezone()
-        self._request_log.append(req_timestamp)
-        self.reported_request_count += 1
-
-    def prune(self):
-        mark_timestamp = datetime.now(timezone.utc).astimezone()
-        while self._request_log and self._request_log[0] < mark_timestamp - timedelta(
-            seconds=self.duration
-        ):
-            self._request_log.popleft()
-            self.reported_request_count -= 1
-
-    def remaining(self):
-        return self._request_log.maxlen - self.reported_request_count
-
-    def wait(self):
-        if self.remaining() > 0:
-            return 0
-
-        ready_time = self._request_log[0] + timedelta(seconds=self.duration)
-        mark_timestamp = datetime.now(timezone.utc).astimezone()
-        if ready_time < mark_timestamp:
-            self.prune()
-            return 0
-
-        return (ready_time - mark_timestamp).total_seconds()
+        self.cap = cap
+        self.count = 0
+        self.window_end = 0.0
+        self.utilisation = 0.0
+        self.next_send = 0.0
+        self.in_flight = 0
+        self.floor = 0
+
+    def pace(self, utilisation: float | None):
+        self.utilisation = utilisation or 0.0
+
+    def book(self, now: float):
+        if not self.in_flight:
+            self.floor = self.count if now < self.window_end else 0
+        self.in_flight += 1
+
+    def release(self):
+        if self.in_flight:
+            self.in_flight -= 1
+
+    def log_count(self, count: int, now: float):
+        # A count no higher than before the request was sent means Riot reset
+        # the window without us noticing, e.g. after a long gap between requests.
+        floor = self.floor if self.in_flight else self.count - 1
+        if now >= self.window_end or count <= floor:
+            self.window_end = now + self.duration
+            self.count = count
+        elif count > self.count:
+            self.count = count
+
+    def remaining(self, now: float) -> int:
+        if now >= self.window_end:
+            return self.cap
+        return self.cap - self.count
+
+    def pacing_gap(self, now: float) -> float:
+        """Return how long to leave after a request sent at ``now``.
+
+        Whatever is left of the target budget is spread evenly over whatever is
+        left of the window, so requests counted by other clients or an earlier
+        run slow the pace down rather than ending in a stall at the cap.
+        """
+        budget = self.cap * self.utilisation
+        if now >= self.window_end:
+            return self.duration / budget
+        budget -= self.count
+        if budget < 1:
+            return self.window_end - now
+        return (self.window_end - now) / budget
+
+    def wait(self, now: float) -> float:
+        wait = self.next_send - now
+        if now < self.window_end:
+            if self.count + self.in_flight >= self.cap:
+                wait = max(wait, self.window_end - now)
+        elif self.in_flight >= self.cap:
+            # The requests in flight open the next window between them.
+            wait = max(wait, self.duration)
+        return wait if wait > 0 else 0.0
 
     def __repr__(self):
-        return f"{len(self._request_log)}:{self.duration}"
+        return f"{self.count}/{self.cap}:{self.duration}"
 
 
 class _RateLimitRecord(NamedTuple):
@@ -56,23 +108,114 @@ class _RateLimitRecord(NamedTuple):
     rate_count: str
 
 
-class RateLimitState:
+class _BucketGroup(NamedTuple):
+    """The buckets parsed from one ``X-*-Rate-Limit`` header value."""
+
+    cap_string: str
+    buckets: tuple[RateLimitBucket, ...]
+    by_duration: dict[str, RateLimitBucket]
+
+
+class RateLimitState(StateValue):
+    """Rate limit buckets for every routing value, app-wide and per endpoint.
+
+    Bucket configs are parsed once per distinct limit header and the buckets a
+    request has to clear are cached per routing value and endpoint, so
+    ``request_wait`` is a lookup and a handful of comparisons. All access is
+    serialised, so lanes can share a single instance, and every request
+    ``request_wait`` lets through counts against the buckets until it's settled.
+
+    By default a bucket is drained as fast as Riot allows and then waited out.
+    With ``pacing`` set to a target utilisation such as ``0.9``, requests are
+    instead spaced evenly so that each window is used up over its full duration
+    at that fraction of its cap; the tightest bucket sets the pace.
+    """
 
-    def __init__(self):
+    def __init__(self, pacing: float | None = None):
 
-        self._rate_limits = {}
+        self._pacing = pacing
+        self._lock = threading.Lock()
+        self._rate_limits: dict[str, dict[str, _BucketGroup]] = {}
+        self._request_buckets: dict[str, dict[str, tuple[RateLimitBucket, ...]]] = {}
         for key, value in REGION_ROUTING_MAP.items():
-            self._rate_limits.setdefault(key, {})
-            self._rate_limits.setdefault(value, {})
+            for routing_value in (key, value):
+                self._rate_limits.setdefault(routing_value, {})
+                self._request_buckets.setdefault(routing_value, {})
+
+    def to_dict(self) -> dict:
+        """Return the buckets with open windows, for writing to tap state.
+
+        Window resets are stored as wall-clock times, since the monotonic clock
+        doesn't carry over between runs.
+        """
+        with self._lock:
+            now = monotonic()
+            wall_now = datetime.now(timezone.utc)
+            state = {}
+            for routing_value, groups in self._rate_limits.items():
+                for key, group in groups.items():
+                    buckets = {
+                        size: {
+                            "count": bucket.count,
+                            "window_end": (
+                                wall_now + timedelta(seconds=bucket.window_end - now)
+                            ).isoformat(),
+                        }
+                        for size, bucket in group.by_duration.items()
+                        if bucket.window_end > now
+                    }
+                    if buckets:
+                        state.setdefault(routing_value, {})[key] = {
+                            "limits": group.cap_string,
+                            "buckets": buckets,
+                        }
+            return state
+
+    @classmethod
+    def from_dict(cls, state: dict, pacing: float | None = None) -> "RateLimitState":
+        """Restore buckets written by ``to_dict``, dropping expired windows."""
+        rate_limits = cls(pacing=pacing)
+        now = monotonic()
+        wall_now = datetime.now(timezone.utc)
+        for routing_value, groups in state.items():
+            if routing_value not in rate_limits._rate_limits:
+                continue
+            for key, group_state in groups.items():
+                group = rate_limits.set_up_buckets(
+                    routing_value, key, group_state["limits"]
+                )
+                for size, bucket_state in group_state["buckets"].items():
+                    bucket = group.by_duration.get(size)
+                    window_left = (
+                        datetime.fromisoformat(bucket_state["window_end"]) - wall_now
+                    ).total_seconds()
+                    if bucket is None or window_left <= 0:
+                        continue
+                    bucket.count = bucket_state["count"]
+                    bucket.window_end = now + min(window_left, bucket.duration)
+        return rate_limits
 
     def set_up_buckets(self, routing_value: str, key: str, cap_string: str):
 
-        key_records = self._rate_limits[routing_value].setdefault(key, {})
+        group = self._rate_limits[routing_value].get(key)
+        if group is not None and group.cap_string == cap_string:
+            return group
+
+        by_duration = {}
         for str_record in cap_string.split(","):
-            cap, size = str_record.split(":")
-            if size not in key_records.keys():
-                key_records[size] = RateLimitBucket(int(size), int(cap))
-        return key_records
+            cap, _, size = str_record.partition(":")
+            bucket = group.by_duration.get(size) if group else None
+            if bucket is None:
+                bucket = RateLimitBucket(int(size), int(cap))
+            bucket.cap = int(cap)
+            bucket.pace(self._pacing)
+            by_duration[size] = bucket
+
+        group = _BucketGroup(cap_string, tuple(by_duration.values()), by_duration)
+        self._rate_limits[routing_value][key] = group
+        # Limits changed, so the cached per-endpoint bucket lists are stale.
+        self._request_buckets[routing_value].clear()
+        return group
 
     def log_response(
         self,
@@ -80,28 +223,100 @@ class RateLimitState:
         rate_limit: _RateLimitRecord,
         endpoint: str | None = None,
     ):
-
+        """Log the counts of a response, which is no longer in flight."""
         key = endpoint if endpoint else "app"
-        app_records = self.set_up_buckets(routing_value, key, rate_limit.rate_cap)
+        with self._lock:
+            for bucket in self._log_counts(routing_value, key, rate_limit):
+                bucket.release()
+
+    def settle(
+        self,
+        routing_value: str,
+        endpoint: str,
+        app_limit: _RateLimitRecord | None = None,
+        method_limit: _RateLimitRecord | None = None,
+    ):
+        """Take a request booked by ``request_wait`` out of flight.
+
+        Its response's counts are logged first, if it carried any.
+        """
+        with self._lock:
+            if app_limit is not None:
+                self._log_counts(routing_value, "app", app_limit)
+            if method_limit is not None:
+                self._log_counts(routing_value, endpoint, method_limit)
+            buckets = self._request_buckets[routing_value].get(endpoint)
+            if buckets is None:
+                buckets = self._combine_buckets(routing_value, endpoint)
+            for bucket in buckets:
+                bucket.release()
+
+    def _log_counts(
+        self, routing_value: str, key: str, rate_limit: _RateLimitRecord
+    ) -> tuple[RateLimitBucket, ...]:
+
+        now = monotonic()
+        group = self.set_up_buckets(routing_value, key, rate_limit.rate_cap)
         for str_record in rate_limit.rate_count.split(","):
-            count, size = str_record.split(":")
-            app_records[size].log_request(rate_limit.datetime_returned)
-            app_records[size].reported_request_count = int(count)
-            app_records[size].prune()
+            count, _, size = str_record.partition(":")
+            group.by_duration[size].log_count(int(count), now)
+        return group.buckets
 
-    def request_wait(self, routing_value: str, endpoint: str) -> int:
+    def request_wait(
+        self, routing_value: str, endpoint: str, book: bool = True
+    ) -> float:
+        """Return how long to wait before sending a request to ``endpoint``.
 
-        min_wait_needed = 0
+        The request is counted as in flight until its response is logged or it's
+        settled, and when pacing its slot is booked, unless ``book`` is false.
+        """
+        with self._lock:
+            buckets = self._request_buckets[routing_value].get(endpoint)
+            if buckets is None:
+                buckets = self._combine_buckets(routing_value, endpoint)
 
-        for bucket in self._rate_limits[routing_value].get(endpoint, {}).values():
-            bucket.prune()
-            min_wait_needed = max(min_wait_needed, bucket.wait())
+            now = monotonic()
+            min_wait_needed = 0.0
+            for bucket in buckets:
+                wait = bucket.wait(now)
+                if wait > min_wait_needed:
+                    min_wait_needed = wait
 
-        for bucket in self._rate_limits[routing_value].get("app", {}).values():
-            bucket.prune()
-            min_wait_needed = max(min_wait_needed, bucket.wait())
+            if book:
+                # The caller sends once the wait is over, so book it now.
+                send_at = now + min_wait_needed
+                for bucket in buckets:
+                    bucket.book(now)
+                    if self._pacing:
+                        bucket.next_send = send_at + bucket.pacing_gap(send_at)
 
         return min_wait_needed
 
+    def remaining(self, routing_value: str, endpoint: str) -> int | None:
+        """Return how many more requests to ``endpoint`` fit in every open window.
+
+        ``None`` until a response has told us the limits.
+        """
+        with self._lock:
+            buckets = self._request_buckets[routing_value].get(endpoint)
+            if buckets is None:
+                buckets = self._combine_buckets(routing_value, endpoint)
+            if not buckets:
+                return None
+            now = monotonic()
+            return min(bucket.remaining(now) for bucket in buckets)
+
+    def _combine_buckets(
+        self, routing_value: str, endpoint: str
+    ) -> tuple[RateLimitBucket, ...]:
+
+        limits = self._rate_limits[routing_value]
+        buckets = ()
+        for key in (endpoint, "app"):
+            if key in limits:
+                buckets += limits[key].buckets
+        self._request_buckets[routing_value][endpoint] = buckets
+        return buckets
+
 
 # Some kind of rate limit mixin to handle Retry-After header?
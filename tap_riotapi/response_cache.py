@@ -0,0 +1,107 @@
+"""On-disk cache of match detail response bodies."""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import requests
+
+
+class MatchDetailCache:
+    """Compressed match detail bodies on disk, keyed by region and match ID.
+
+    A finished match never changes, so once a match detail has been downloaded
+    it can be served from here on every later run, e.g. a backfill or a re-run
+    after ``match_detail_set`` was reset, without spending rate limit budget.
+
+    Bodies are zlib-compressed, one file per match under ``directory/region``.
+    When the files add up to more than ``max_bytes``, the least recently used
+    are deleted. Recency is kept in the files' modification times, so it carries
+    over between runs. Safe to share between lanes.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+
+        self._directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path -> compressed size, least recently used first
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._size = 0
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self._directory.glob("*/*.json.z"):
+            stat = path.stat()
+            found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._size += size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, region: str, match_id: str) -> Path:
+        return self._directory / region / f"{match_id}.json.z"
+
+    def get(self, region: str, match_id: str) -> bytes | None:
+        """Return the cached body for a match, or ``None`` on a miss."""
+        path = self._path(region, match_id)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+        try:
+            body = zlib.decompress(path.read_bytes())
+            os.utime(path)
+        except (OSError, zlib.error):
+            self._discard(path)
+            return None
+        return body
+
+    def put(self, region: str, match_id: str, body: bytes) -> None:
+        """Store the body for a match, evicting old entries past the size cap."""
+        path = self._path(region, match_id)
+        compressed = zlib.compress(body)
+        path.parent.mkdir(exist_ok=True)
+        # Written aside and moved into place, so a reader never sees half a file.
+        partial = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        partial.write_bytes(compressed)
+        os.replace(partial, path)
+
+        with self._lock:
+            self._size += len(compressed) - self._entries.pop(path, 0)
+            self._entries[path] = len(compressed)
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_path, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(old_path)
+        for old_path in evicted:
+            old_path.unlink(missing_ok=True)
+
+    def _discard(self, path: Path) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(path, 0)
+        path.unlink(missing_ok=True)
+
+
+def cached_response(
+    prepared_request: requests.PreparedRequest, body: bytes
+) -> requests.Response:
+    """Build the response a cache hit stands in for.
+
+    It has no rate limit headers, since Riot never counted it.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.url = prepared_request.url
+    response.request = prepared_request
+    return response
@@ -0,0 +1,59 @@
+"""Request and wall-clock budget for a single run."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from time import monotonic
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RunBudget:
+    """How many requests, and how much time, a run may spend.
+
+    Once either runs out the budget is ``exhausted``, and the tap winds down:
+    no new partitions, child contexts, ladder pages or match details are
+    started, while requests already under way finish and their records are
+    kept. Everything left over stays in state, so the next run carries on from
+    there: the match detail queue, the bookmarks of player histories stopped
+    between pages, and the players whose history was never synced.
+    """
+
+    def __init__(
+        self, max_requests: int | None = None, max_seconds: float | None = None
+    ):
+
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.requests = 0
+        self._started = monotonic()
+        self._lock = threading.Lock()
+        self._logged = False
+
+    def spend(self) -> None:
+        """Count a request sent to the API."""
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def exhausted(self) -> bool:
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            reason = f"request budget of {self.max_requests}"
+        elif (
+            self.max_seconds is not None
+            and monotonic() - self._started >= self.max_seconds
+        ):
+            reason = f"deadline of {self.max_seconds / 60:g} minutes"
+        else:
+            return False
+
+        if not self._logged:
+            self._logged = True
+            LOGGER.warning(
+                "Reached the %s after %d requests. Finishing what's in flight "
+                "and leaving the rest for the next run.",
+                reason,
+                self.requests,
+            )
+        return True
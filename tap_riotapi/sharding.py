@@ -0,0 +1,215 @@
+"""Splitting a sync across processes, and merging their states back together.
+
+Shard states are merged with::
+
+    python -m tap_riotapi.sharding shard-1.json shard-2.json > state.json
+
+Each shard's state records the shard under ``"shard"``, so the merge can tell the
+bookmarks a shard kept up to date from the copies of the starting state every
+shard carries.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from typing import TYPE_CHECKING, NamedTuple
+
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_riotapi.match_id_set import MatchIdSet, union_match_id_dicts
+from tap_riotapi.utils import REGION_ROUTING_MAP
+
+if TYPE_CHECKING:
+    from singer_sdk.helpers.types import Context
+
+
+def partition_key(context: Context) -> str:
+    """Return what identifies the top-level partition ``context`` descends from."""
+    if "gameName" in context:
+        return f"{context['gameName']}#{context['tagLine']}".lower()
+    return "/".join(
+        (
+            context["platform_routing_value"],
+            context["tier"].lower(),
+            context.get("division", ""),
+        )
+    )
+
+
+class Shard(NamedTuple):
+    """One of ``count`` shards a sync is split into, numbered from 1.
+
+    By ``region``, whole region routing values are dealt out to the shards in
+    turn, the regions in the ``following`` config first. Shards then never
+    share a region's rate limits or its matches. By ``partition``, each
+    followed player and ladder is assigned by a stable hash instead, which
+    spreads a single region over every shard.
+
+    Top-level partitions and queued match details belong to exactly one shard,
+    and the children of a partition go with it.
+    """
+
+    index: int
+    count: int
+    by: str
+    regions: tuple[str, ...]
+
+    @classmethod
+    def parse(
+        cls, spec: str, by: str = "region", platforms: tuple[str, ...] = ()
+    ) -> Shard:
+        """Parse ``i/N``, e.g. ``2/4`` for the second of four shards."""
+        index, _, count = spec.partition("/")
+        try:
+            index, count = int(index), int(count)
+        except ValueError:
+            index = count = 0
+        if not 1 <= index <= count:
+            raise ConfigValidationError(
+                f"shard must be i/N with 1 <= i <= N, e.g. 1/4, not {spec!r}"
+            )
+        if by not in ("region", "partition"):
+            raise ConfigValidationError("shard_by must be 'region' or 'partition'")
+
+        regions = sorted(
+            {
+                REGION_ROUTING_MAP[platform.lower()]
+                for platform in platforms
+                if platform.lower() in REGION_ROUTING_MAP
+            }
+        )
+        regions += sorted(set(REGION_ROUTING_MAP.values()) - set(regions))
+        return cls(index, count, by, tuple(regions))
+
+    @classmethod
+    def from_dict(cls, state: dict) -> Shard:
+        """Return the shard recorded under a state's ``"shard"`` key."""
+        return cls(
+            state["index"], state["count"], state["by"], tuple(state["regions"])
+        )
+
+    def owns(self, context: Context) -> bool:
+        if self.by == "region":
+            number = self.regions.index(context["region_routing_value"])
+        else:
+            digest = hashlib.blake2b(
+                partition_key(context).encode(), digest_size=8
+            ).digest()
+            number = int.from_bytes(digest, "big")
+        return number % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def _match_ids(state: dict) -> MatchIdSet:
+    raw = state.get("match_detail_set")
+    if isinstance(raw, str):
+        # States written before the compact format hold a JSON list.
+        return MatchIdSet.from_ids(json.loads(raw))
+    return MatchIdSet.from_dict(raw or {})
+
+
+def merge_shard_states(states: list[dict]) -> dict:
+    """Merge the final states of a sharded sync into one.
+
+    Every shard starts from the same state, so each carries a copy of the
+    bookmarks of partitions other shards own, as they were before the sync. A
+    partition bookmark is therefore only taken from the shard that owns the
+    partition, and a player entry from the shard that synced the player's
+    history, if any did; otherwise the most recent entry wins. States written
+    without a ``"shard"`` entry own everything in them. Riot ID lookups are
+    combined, the most recent one winning. Match IDs are unioned, and queued
+    match details are kept unless some shard fetched them. Rate limits are
+    combined per key and routing value.
+    """
+    merged: dict = {}
+    for state in states:
+        merged |= {
+            key: value for key, value in state.items() if key not in ("delta", "shard")
+        }
+    shards = [
+        Shard.from_dict(state["shard"]) if "shard" in state else None
+        for state in states
+    ]
+
+    players: dict[str, dict] = {}
+    ranks: dict[str, tuple[bool, str]] = {}
+    for state, shard in zip(states, shards):
+        for puuid, entry in state.get("player_match_history_state", {}).items():
+            # Only the shard that synced a player marks their entry.
+            owned = shard is not None and entry.get("shard") == str(shard)
+            rank = (owned, entry.get("last_processed", ""))
+            if puuid not in ranks or rank >= ranks[puuid]:
+                ranks[puuid] = rank
+                players[puuid] = {k: v for k, v in entry.items() if k != "shard"}
+    merged["player_match_history_state"] = players
+
+    bookmarks: dict[str, dict] = {}
+    for state, shard in zip(states, shards):
+        for stream_name, stream_state in state.get("bookmarks", {}).items():
+            target = bookmarks.setdefault(stream_name, {})
+            target |= {k: v for k, v in stream_state.items() if k != "partitions"}
+            if "partitions" in stream_state:
+                partitions = {
+                    json.dumps(partition["context"], sort_keys=True): partition
+                    for partition in target.get("partitions", [])
+                }
+                for partition in stream_state["partitions"]:
+                    if shard is None or shard.owns(partition["context"]):
+                        key = json.dumps(partition["context"], sort_keys=True)
+                        partitions[key] = partition
+                target["partitions"] = list(partitions.values())
+    merged["bookmarks"] = bookmarks
+
+    merged["match_detail_set"] = union_match_id_dicts(
+        _match_ids(state).to_dict() for state in states
+    )
+    match_ids = MatchIdSet.from_dict(merged["match_detail_set"])
+
+    queue: dict[str, dict[str, dict]] = {}
+    for state in states:
+        for region, items in state.get("match_detail_queue", {}).items():
+            for item in items:
+                match_id = item["context"]["matchId"]
+                if match_id not in match_ids:
+                    queue.setdefault(region, {})[match_id] = item
+    merged["match_detail_queue"] = {
+        region: list(items.values()) for region, items in queue.items()
+    }
+
+    puuids: dict[str, list[str]] = {}
+    for state in states:
+        for riot_id, entry in state.get("riot_id_puuids", {}).items():
+            if riot_id not in puuids or entry[1] >= puuids[riot_id][1]:
+                puuids[riot_id] = entry
+    merged["riot_id_puuids"] = puuids
+
+    rate_limits: dict[str, dict] = {}
+    for state in states:
+        for key, routing_values in state.get("rate_limits", {}).items():
+            rate_limits[key] = rate_limits.get(key, {}) | routing_values
+    merged["rate_limits"] = rate_limits
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge the final states of a sharded sync into one."
+    )
+    parser.add_argument("states", nargs="+", metavar="STATE_FILE")
+    args = parser.parse_args()
+
+    states = []
+    for path in args.states:
+        with open(path) as state_file:
+            states.append(json.load(state_file))
+    json.dump(merge_shard_states(states), sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
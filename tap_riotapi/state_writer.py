@@ -0,0 +1,222 @@
+"""Throttled, optionally incremental, STATE message output.
+
+A full state and the delta STATE messages written after it are merged with::
+
+    python -m tap_riotapi.state_writer full.json delta-1.json delta-2.json > state.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from contextlib import contextmanager
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from singer_sdk.singerlib import StateMessage
+
+from tap_riotapi.match_id_set import MatchIdSet
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from tap_riotapi.tap import TapRiotAPI
+
+
+def _compact_partitions(stream_state: dict) -> dict:
+    # A partition left with nothing but its context carries no bookmark; the
+    # SDK recreates it on demand.
+    if "partitions" not in stream_state:
+        return stream_state
+    return stream_state | {
+        "partitions": [
+            partition
+            for partition in stream_state["partitions"]
+            if partition.keys() - {"context"}
+        ]
+    }
+
+
+def compact_state(state: dict) -> None:
+    """Drop empty partition bookmarks and player entries from ``state``."""
+    for stream_name, stream_state in state.get("bookmarks", {}).items():
+        state["bookmarks"][stream_name] = _compact_partitions(stream_state)
+    players = state.get("player_match_history_state", {})
+    for puuid in [puuid for puuid, entry in players.items() if not entry]:
+        del players[puuid]
+
+
+_MERGED_DELTA_KEYS = (
+    "delta",
+    "bookmarks",
+    "player_match_history_state",
+    "match_detail_set",
+    "riot_id_puuids",
+)
+
+
+def apply_state_delta(state: dict, delta: dict) -> dict:
+    """Return ``state`` with a delta STATE message from ``StateWriter`` merged in.
+
+    ``state`` is a full STATE message value, e.g. the last one a target saved.
+    """
+    if not delta.get("delta"):
+        return delta
+
+    merged = state | {
+        key: value
+        for key, value in delta.items()
+        if key not in _MERGED_DELTA_KEYS
+    }
+    merged["bookmarks"] = state.get("bookmarks", {}) | delta.get("bookmarks", {})
+    merged["player_match_history_state"] = state.get(
+        "player_match_history_state", {}
+    ) | delta.get("player_match_history_state", {})
+
+    match_ids = MatchIdSet.from_dict(state.get("match_detail_set") or {})
+    for match_id in delta.get("match_detail_set", []):
+        match_ids.add(match_id)
+    merged["match_detail_set"] = match_ids.to_dict()
+    merged["riot_id_puuids"] = state.get("riot_id_puuids", {}) | delta.get(
+        "riot_id_puuids", {}
+    )
+    return merged
+
+
+class StateWriter:
+    """Writes the tap's STATE messages for every stream.
+
+    Streams tell the writer when they have state worth saving, and it decides
+    whether a message goes out: straight away by default, or once
+    ``flush_records`` records have been written or ``flush_seconds`` have passed
+    since the last message. Skipped messages are never lost, since the next
+    message carries the whole state, and every top-level stream ends with one.
+
+    With ``delta`` set, only the first message and the one closing each top-level
+    stream carry the full state. In between, a message with ``"delta": true``
+    carries only what changed: the bookmarks of streams that wrote state, the
+    player entries that changed, and the match IDs fetched and Riot IDs resolved
+    since the last message.
+    ``apply_state_delta`` folds these into the previous full state.
+
+    The state is compacted before each top-level stream's closing message.
+    """
+
+    def __init__(
+        self,
+        tap: TapRiotAPI,
+        flush_records: int | None = None,
+        flush_seconds: float | None = None,
+        delta: bool = False,
+    ):
+
+        self._tap = tap
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.delta = delta
+        self._records = 0
+        self._last_flush = monotonic()
+        self._dirty_streams: set[str] = set()
+        self._closing = False
+        self._baseline_written = False
+        # puuid -> player entry as of the last message, for deltas
+        self._sent_players: dict[str, dict] = {}
+
+    def record_written(self) -> None:
+        self._records += 1
+
+    def mark_dirty(self, stream_name: str) -> None:
+        self._dirty_streams.add(stream_name)
+
+    @contextmanager
+    def closing(self) -> Iterator[None]:
+        """Hold back STATE messages, then write the full state, compacted."""
+        self._closing = True
+        try:
+            yield
+        finally:
+            self._closing = False
+        compact_state(self._tap.state)
+        self._write_full()
+
+    def write(self) -> None:
+        """Write a STATE message if one is pending and due."""
+        if self._closing:
+            return
+        if self._dirty_streams and self._due():
+            if self.delta and self._baseline_written:
+                self._write(self._delta())
+            else:
+                self._write_full()
+
+    def _due(self) -> bool:
+        if self.flush_records is None and self.flush_seconds is None:
+            return True
+        if self.flush_records is not None and self._records >= self.flush_records:
+            return True
+        return (
+            self.flush_seconds is not None
+            and monotonic() - self._last_flush >= self.flush_seconds
+        )
+
+    def _write_full(self) -> None:
+        state = self._tap.state
+        if self.delta:
+            self._sent_players = {
+                puuid: dict(entry)
+                for puuid, entry in state.get("player_match_history_state", {}).items()
+            }
+            state["match_detail_set"].take_new()
+            state["riot_id_puuids"].take_new()
+        self._write(state)
+        self._baseline_written = True
+
+    def _delta(self) -> dict:
+        state = self._tap.state
+        bookmarks = state.get("bookmarks", {})
+        changed_players = {}
+        for puuid, entry in state["player_match_history_state"].items():
+            if self._sent_players.get(puuid) != entry:
+                changed_players[puuid] = entry
+                self._sent_players[puuid] = dict(entry)
+        return {
+            "delta": True,
+            "bookmarks": {
+                name: _compact_partitions(bookmarks[name])
+                for name in self._dirty_streams
+                if name in bookmarks
+            },
+            "player_match_history_state": changed_players,
+            "match_detail_set": state["match_detail_set"].take_new(),
+            "riot_id_puuids": state["riot_id_puuids"].take_new(),
+            "match_detail_queue": state["match_detail_queue"],
+            "rate_limits": state["rate_limits"],
+        }
+
+    def _write(self, value: dict) -> None:
+        self._tap.write_message(StateMessage(value=value))
+        self._records = 0
+        self._last_flush = monotonic()
+        self._dirty_streams.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge delta STATE messages into the full state before them."
+    )
+    parser.add_argument("state", metavar="FULL_STATE_FILE")
+    parser.add_argument("deltas", nargs="*", metavar="DELTA_FILE")
+    args = parser.parse_args()
+
+    with open(args.state) as state_file:
+        state = json.load(state_file)
+    for path in args.deltas:
+        with open(path) as delta_file:
+            state = apply_state_delta(state, json.load(delta_file))
+    json.dump(state, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
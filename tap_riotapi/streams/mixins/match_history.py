@@ -1,8 +1,7 @@
-from datetime import datetime, timedelta, timezone
-from math import floor
+from datetime import datetime, timezone
+from math import ceil, floor
 from typing import Iterable, Any
 
-from _decimal import Decimal
 from requests import Response
 
 from singer_sdk import typing as th
@@ -11,6 +10,7 @@ from singer_sdk.pagination import BaseAPIPaginator, BaseOffsetPaginator
 from singer_sdk.streams.core import REPLICATION_INCREMENTAL
 
 from tap_riotapi.streams.mixins.rest_util import ResumablePaginationMixin
+from tap_riotapi.utils import response_json
 
 
 class TFTMatchListMixin(ResumablePaginationMixin):
@@ -52,11 +52,12 @@ class TFTMatchListMixin(ResumablePaginationMixin):
         context: types.Context | None,  # noqa: ARG002
         next_page_token: Any | None,  # noqa: ANN401
     ) -> dict[str, Any]:
+        paginator = self.get_context_state(context)["current_paginator"]
         return {
-            "count": self._page_size,
+            "count": paginator.current_page_size,
             "start": next_page_token,
             "startTime": floor(self.get_start_timestamp(context).timestamp()),
-            "endTime": floor(self.get_end_timestamp().timestamp()),
+            "endTime": floor(self.get_end_timestamp(context).timestamp()),
         }
 
     def build_paginator_from_state(self, state_partition: dict) -> BaseAPIPaginator:
@@ -66,31 +67,60 @@ class TFTMatchListMixin(ResumablePaginationMixin):
             and "last_used_query_params" in state_partition
             and "session_record_count"
         ):
-            partial_page_finished = (
-                state_partition["session_record_count"]
-                % state_partition["last_used_query_params"]["count"]
-            )
+            if "page_record_count" in state_partition:
+                partial_page_finished = state_partition["page_record_count"]
+            else:
+                partial_page_finished = (
+                    state_partition["session_record_count"]
+                    % state_partition["last_used_query_params"]["count"]
+                )
             starting_index = (
                 state_partition["last_used_query_params"]["start"]
                 + partial_page_finished
             )
+            first_page_size = None
+        else:
+            first_page_size = self.expected_match_count(
+                state_partition.get("context") if state_partition else None
+            )
         return MatchHistoryPaginator(
-            start_value=starting_index, page_size=self._page_size
+            start_value=starting_index,
+            page_size=self._page_size,
+            first_page_size=first_page_size,
         )
 
+    def expected_match_count(self, context: types.Context | None) -> int | None:
+        """Return how many match IDs to ask for first, if it can be estimated.
+
+        Ladder entries carry a player's ranked games played, so the change since
+        their last check is about how many new matches there are. Unranked games
+        aren't counted in it, hence the margin; if the first page still comes
+        back full, paging carries on with full pages.
+        """
+        if not context or "matches_played" not in context:
+            return None
+        my_history_state = self.tap_state["player_match_history_state"].get(
+            context["puuid"], {}
+        )
+        if "matches_played" not in my_history_state:
+            return None
+        new_matches = context["matches_played"] - my_history_state["matches_played"]
+        if new_matches <= 0:
+            # e.g. ranked stats reset for a new set
+            return None
+        return min(ceil(new_matches * 1.5) + 5, self._page_size)
+
     def get_start_timestamp(self, context: types.Context):
 
         state_dict = self.get_context_state(context)
         if "last_used_query_params" in state_dict:
-            last_used_end_param = datetime.fromtimestamp(
-                state_dict["last_used_query_params"]["endTime"],
+            # Carrying on with a history part-way through, in this run or one
+            # that was cut short: later pages offset into the same window.
+            last_used_start_param = datetime.fromtimestamp(
+                state_dict["last_used_query_params"]["startTime"],
                 tz=timezone.utc
             )
-            gap_period = self._tap.initial_timestamp - last_used_end_param
-            if gap_period > timedelta(days=3):
-                return self._tap.initial_timestamp
-            else:
-                return last_used_end_param
+            return max(last_used_start_param, self._tap.initial_timestamp)
 
         if context["puuid"] in self.tap_state["player_match_history_state"]:
             my_history_state = self.tap_state["player_match_history_state"][
@@ -103,7 +133,15 @@ class TFTMatchListMixin(ResumablePaginationMixin):
                 )
         return self._tap.initial_timestamp
 
-    def get_end_timestamp(self):
+    def get_end_timestamp(self, context: types.Context | None = None):
+
+        if context is not None:
+            state_dict = self.get_context_state(context)
+            if "last_used_query_params" in state_dict:
+                return datetime.fromtimestamp(
+                    state_dict["last_used_query_params"]["endTime"],
+                    tz=timezone.utc
+                )
         return self._tap.end_timestamp
 
     def post_process(
@@ -127,12 +165,16 @@ class TFTMatchListMixin(ResumablePaginationMixin):
         record: types.Record,
         context: types.Context | None,
     ) -> Iterable[types.Context | None]:
-        if (
-            not record["matchId"]
-            or record["matchId"] in self.tap_state["match_detail_set"]
-        ):
-            return []
-        yield self.get_child_context(record=record, context=context)
+        # Match details are fetched through the tap-wide queue rather than
+        # inline, so each match is only requested once across all streams.
+        if record["matchId"]:
+            child_context = self.get_child_context(record=record, context=context)
+            for child_stream in self.child_streams:
+                if child_stream.selected or child_stream.has_selected_descendents:
+                    self.tap_state["match_detail_queue"].add(
+                        child_stream.name, child_context
+                    )
+        return []
 
     def get_child_context(
         self,
@@ -151,9 +193,27 @@ class TFTMatchListMixin(ResumablePaginationMixin):
             state_dict = self.get_context_state(context)
             state_dict.setdefault("session_record_count", 0)
             state_dict["session_record_count"] += 1
+            last_start = state_dict.get("last_used_query_params", {}).get("start")
+            if latest_record["url_params_used"]["start"] != last_start:
+                state_dict["page_record_count"] = 0
+            state_dict["page_record_count"] = state_dict.get("page_record_count", 0) + 1
             state_dict["last_used_query_params"] = latest_record["url_params_used"]
+            if latest_record["matchId"]:
+                state_dict["found_matches"] = True
 
     def _finalize_state(self, state: dict | None = None) -> None:
+        if "context" not in state:
+            # The stream-level state, when no player's history was synced.
+            super()._finalize_state(state)
+            return
+
+        if state.get("interrupted"):
+            # Stopped between pages by the run budget: the bookmark stays, and
+            # the player isn't marked as checked, so the next run resumes it.
+            state.pop("current_paginator", None)
+            super()._finalize_state(state)
+            return
+
         match_history_state = self.tap_state["player_match_history_state"]
         new_player_state = {}
 
@@ -165,6 +225,13 @@ class TFTMatchListMixin(ResumablePaginationMixin):
 
         if "matches_played" in state["context"]:
             new_player_state["matches_played"] = state["context"]["matches_played"]
+        elif "last_used_query_params" in state:
+            # Followed players have no matches_played to compare, so whether
+            # the check found anything decides when they're next checked.
+            new_player_state["idle"] = not state.get("found_matches", False)
+        if self._tap.shard is not None:
+            # Marks the entry as this shard's for merge_shard_states.
+            new_player_state["shard"] = str(self._tap.shard)
         match_history_state.setdefault(state["context"]["puuid"], {}).update(
             new_player_state
         )
@@ -173,6 +240,18 @@ class TFTMatchListMixin(ResumablePaginationMixin):
         state.clear()
         state["context"] = context
 
+        # A bookmark left by an interrupted run is keyed by the ladder entry it
+        # was synced under, so it's never resumed once the entry has changed.
+        # This player's history is now finished, which makes it dead weight.
+        partitions = self.stream_state.get("partitions", [])
+        partitions[:] = [
+            partition
+            for partition in partitions
+            if partition is state
+            or not partition.get("interrupted")
+            or partition["context"].get("puuid") != context["puuid"]
+        ]
+
         super()._finalize_state(state)
 
     def _write_record_message(self, record: types.Record) -> None:
@@ -181,6 +260,29 @@ class TFTMatchListMixin(ResumablePaginationMixin):
 
 
 class MatchHistoryPaginator(BaseOffsetPaginator):
+    """Offsets through a player's match IDs.
+
+    The first page asks for ``first_page_size`` IDs, if given, and every later
+    page for ``page_size``.
+    """
+
+    def __init__(
+        self,
+        start_value: int,
+        page_size: int,
+        first_page_size: int | None = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(start_value, page_size, *args, **kwargs)
+        self.current_page_size = first_page_size or page_size
+
+    def advance(self, response: Response) -> None:
+        super().advance(response)
+        self.current_page_size = self._page_size
 
     def has_more(self, response: Response) -> bool:
-        return len(response.json(parse_float=Decimal)) == self._page_size
+        return len(response_json(response)) == self.current_page_size
+
+    def get_next(self, response: Response) -> int | None:
+        return self._value + self.current_page_size
@@ -6,13 +6,19 @@ from singer_sdk.helpers.types import Context
 from singer_sdk.pagination import BaseAPIPaginator
 from singer_sdk import metrics
 
+from tap_riotapi.api_keys import RetiredKeyError
+
 
 class ResumablePaginationMixin:
 
     def request_records(self, context: Context | None) -> Iterable[dict]:
         """Request records from REST endpoint(s), returning response records.
 
-        If pagination is detected, pages will be recursed automatically.
+        If pagination is detected, pages will be recursed automatically. Once the
+        run budget is exhausted no further page is requested, and the partition
+        is flagged ``interrupted`` so that its bookmark is kept to resume from.
+        The same goes once the API key a PUUID was resolved with is retired, as
+        no other key can send it.
 
         Args:
             context: Stream partition or context dictionary.
@@ -21,6 +27,7 @@ class ResumablePaginationMixin:
             An item for every record in the response.
         """
         paginator = self.get_new_paginator(context)
+        self.get_context_state(context).pop("interrupted", None)
         decorated_request = self.request_decorator(self._request)
         pages = 0
 
@@ -28,11 +35,21 @@ class ResumablePaginationMixin:
             request_counter.context = context
 
             while not paginator.finished:
+                if pages and self._tap.run_budget.exhausted:
+                    self.get_context_state(context)["interrupted"] = True
+                    break
                 prepared_request = self.prepare_request(
                     context,
                     next_page_token=paginator.current_value,
                 )
-                resp = decorated_request(prepared_request, context)
+                try:
+                    resp = decorated_request(prepared_request, context)
+                except RetiredKeyError as error:
+                    self.logger.warning(
+                        "%s, leaving the rest of %s for the next run.", error, context
+                    )
+                    self.get_context_state(context)["interrupted"] = True
+                    break
                 request_counter.increment()
                 self.update_sync_costs(prepared_request, resp, context)
                 records = iter(self.parse_response(resp))
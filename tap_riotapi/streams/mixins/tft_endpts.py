@@ -1,13 +1,31 @@
+from functools import partial
 from typing import Any, Iterable
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 from singer_sdk.helpers import types
 
+from tap_riotapi.response_cache import cached_response
+from tap_riotapi.utils import TIER_ORDER
+
+# Roughly how long a TFT set, and so a player's ranked games played, lasts.
+SET_DAYS = 120
+
 
 class TFTRankedLadderMixin:
+    """League entries, with each player's match history as a child stream.
+
+    With ``prioritize_ladder_players`` set, players' histories aren't synced as
+    the ladder pages come in. They are held back until every partition of the
+    ladder is done and then synced in order of ``child_priority``, so a run cut
+    short has still fetched the players most likely to have new matches.
+    """
 
     routing_type = "platform"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._deferred_children: list[tuple[tuple, int, types.Context]] = []
+
     def get_url_params(
         self,
         context: types.Context | None,  # noqa: ARG002
@@ -29,6 +47,7 @@ class TFTRankedLadderMixin:
             "puuid": initial_row["puuid"],
             "lp": initial_row["leaguePoints"],
             "matches_played": initial_row["wins"] + initial_row["losses"],
+            "api_key_id": row["api_key_id"],
         }
 
     def generate_child_contexts(
@@ -55,6 +74,65 @@ class TFTRankedLadderMixin:
     ) -> types.Context | None:
         return record | context if record else context
 
+    def child_priority(self, context: types.Context) -> tuple:
+        """Return a sort key putting players with the most new matches first.
+
+        A player's change in ranked games played since their last check is
+        how many new matches they have. Players never checked before are
+        guessed at from their games played this set, scaled to the sync window.
+        Ties go to the player checked longest ago, then to the higher tier.
+        """
+        my_history_state = self.tap_state["player_match_history_state"].get(
+            context["puuid"], {}
+        )
+        window_start = max(
+            my_history_state.get("last_processed", self._tap.initial_timestamp),
+            self._tap.initial_timestamp,
+        )
+        window_days = (self._tap.end_timestamp - window_start).total_seconds() / 86400
+
+        new_matches = context["matches_played"] - my_history_state.get(
+            "matches_played", context["matches_played"]
+        )
+        if new_matches <= 0:
+            new_matches = context["matches_played"] * min(1.0, window_days / SET_DAYS)
+        tier = context["tier"].lower()
+        tier_rank = TIER_ORDER.index(tier) if tier in TIER_ORDER else len(TIER_ORDER)
+        return -new_matches, -window_days, tier_rank
+
+    def _sync_children(self, child_context: types.Context | None) -> None:
+        if child_context is None or not self.config.get("prioritize_ladder_players"):
+            super()._sync_children(child_context)
+            return
+        priority = self.child_priority(child_context)
+        self._deferred_children.append(
+            (priority, len(self._deferred_children), child_context)
+        )
+
+    def _sync_deferred_children(self) -> None:
+        ordered = [context for *_, context in sorted(self._deferred_children)]
+        self._deferred_children = []
+        if not ordered:
+            return
+        self.logger.info(
+            "Syncing match history for %d players by expected new matches.",
+            len(ordered),
+        )
+
+        lanes = self._tap.lane_executor
+        if lanes is None or lanes.in_lane:
+            for context in ordered:
+                super()._sync_children(context)
+            return
+
+        # Histories are fetched per region, so each region keeps its order.
+        regions: dict[str, list] = {}
+        for context in ordered:
+            regions.setdefault(context["region_routing_value"], []).append(
+                partial(super()._sync_children, context)
+            )
+        lanes.run_lanes(regions, name=f"{self.name}-children")
+
 
 class TFTMatchDetailMixin:
 
@@ -136,6 +214,22 @@ class TFTMatchDetailMixin:
         ),
     ).to_dict()
 
+    def _request(self, prepared_request, context: types.Context | None):
+        # Finished matches never change, so a cached copy is as good as a fresh
+        # one and doesn't touch the rate limits.
+        cache = self._tap.match_detail_cache
+        if cache is None:
+            return super()._request(prepared_request, context)
+
+        region, match_id = context["region_routing_value"], context["matchId"]
+        body = cache.get(region, match_id)
+        if body is not None:
+            return cached_response(prepared_request, body)
+
+        response = super()._request(prepared_request, context)
+        cache.put(region, match_id, response.content)
+        return response
+
     def _increment_stream_state(
         self,
         latest_record: types.Record,
@@ -143,4 +237,4 @@ class TFTMatchDetailMixin:
         context: types.Context | None = None,
     ):
         super()._increment_stream_state(latest_record, context=context)
-        self.tap_state.setdefault("match_detail_set", set()).add(context["matchId"])
+        self.tap_state["match_detail_set"].add(context["matchId"])
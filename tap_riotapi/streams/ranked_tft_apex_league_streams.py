@@ -3,7 +3,7 @@ from __future__ import annotations
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
 from tap_riotapi.client import RiotAPIStream
-from tap_riotapi.utils import APEX_TIERS, REGION_ROUTING_MAP, flatten_config
+from tap_riotapi.utils import APEX_TIERS, REGION_ROUTING_MAP
 from tap_riotapi.streams.mixins.tft_endpts import (
     TFTMatchDetailMixin,
     TFTRankedLadderMixin,
@@ -26,9 +26,9 @@ class ApexTierRankedLadderStream(TFTRankedLadderMixin, RiotAPIStream):
 
     @property
     def partitions(self) -> list[dict] | None:
-        _, apex_league_config, _ = flatten_config(self.config["following"])
+        shard = self._tap.shard
         partitions = []
-        for item in apex_league_config:
+        for item in self._tap.following_config.apex_leagues:
             platform = item["region"].lower()
             if platform not in REGION_ROUTING_MAP.keys():
                 continue
@@ -41,7 +41,11 @@ class ApexTierRankedLadderStream(TFTRankedLadderMixin, RiotAPIStream):
                         "region_routing_value": region,
                     }
                 )
-        return partitions
+        return [
+            partition
+            for partition in partitions
+            if shard is None or shard.owns(partition)
+        ]
 
     @property
     def records_jsonpath(self):
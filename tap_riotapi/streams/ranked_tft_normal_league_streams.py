@@ -1,13 +1,17 @@
 from __future__ import annotations
-from decimal import Decimal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from requests import Response
-from typing import Any
+from typing import Any, Iterable
 
+from singer_sdk import metrics
 from singer_sdk import typing as th  # JSON Schema typing helpers
 from singer_sdk.pagination import BaseAPIPaginator, BasePageNumberPaginator
 from singer_sdk.helpers import types
 
 from tap_riotapi.client import RiotAPIStream
+from tap_riotapi.run_budget import RunBudget
 from tap_riotapi.streams.mixins.tft_endpts import (
     TFTMatchDetailMixin,
     TFTRankedLadderMixin,
@@ -17,7 +21,7 @@ from tap_riotapi.utils import (
     ROMAN_NUMERALS,
     NON_APEX_TIERS,
     REGION_ROUTING_MAP,
-    flatten_config,
+    response_json,
 )
 
 
@@ -28,6 +32,7 @@ class NonApexLeaguePaginator(BasePageNumberPaginator):
         start_value: int,
         page_size: int,
         *args: Any,
+        budget: RunBudget | None = None,
         **kwargs: Any,
     ) -> None:
         """Create a new paginator.
@@ -36,13 +41,17 @@ class NonApexLeaguePaginator(BasePageNumberPaginator):
             start_value: Initial value.
             page_size: Constant page size.
             args: Paginator positional arguments.
+            budget: Run budget, past which no further page is requested.
             kwargs: Paginator keyword arguments.
         """
         super().__init__(start_value, *args, **kwargs)
         self._page_size = page_size
+        self._budget = budget
 
     def has_more(self, response: Response) -> bool:
-        return len(response.json(parse_float=Decimal)) == self._page_size
+        if self._budget is not None and self._budget.exhausted:
+            return False
+        return len(response_json(response)) == self._page_size
 
 
 class NormalTierRankedLadderStream(TFTRankedLadderMixin, RiotAPIStream):
@@ -58,10 +67,10 @@ class NormalTierRankedLadderStream(TFTRankedLadderMixin, RiotAPIStream):
     @property
     def partitions(self) -> list[dict] | None:
 
-        _, _, reg_league_config = flatten_config(self.config["following"])
+        shard = self._tap.shard
         league_list = []
 
-        for item in reg_league_config:
+        for item in self._tap.following_config.reg_leagues:
             platform = item["region"].lower()
             if platform not in REGION_ROUTING_MAP.keys():
                 continue
@@ -79,10 +88,79 @@ class NormalTierRankedLadderStream(TFTRankedLadderMixin, RiotAPIStream):
                 else:
                     for n in range(1, 5):
                         league_list.append(new_item | {"division": ROMAN_NUMERALS[n]})
-        return league_list
+        return [
+            league
+            for league in league_list
+            if shard is None or shard.owns(league)
+        ]
 
     def get_new_paginator(self) -> BaseAPIPaginator:
-        return NonApexLeaguePaginator(start_value=1, page_size=205)
+        return NonApexLeaguePaginator(
+            start_value=1, page_size=205, budget=self._tap.run_budget
+        )
+
+    def request_records(self, context: types.Context | None) -> Iterable[dict]:
+        """Request ladder pages, fetching up to ``ladder_prefetch_pages`` ahead.
+
+        Page numbers are known up front, so while one page is being parsed the
+        next ones can already be on their way. No more pages are in flight than
+        the platform's rate limit buckets have room for, and the pages are
+        still emitted in order. Once a short page marks the end of the ladder,
+        requests that haven't been sent yet are cancelled.
+
+        On a lane, other lanes run while this one waits for its pages, and the
+        prefetch threads don't take the lane's routing gate, so the pages really
+        are in flight side by side.
+        """
+        depth = self.config.get("ladder_prefetch_pages") or 1
+        if depth <= 1:
+            yield from super().request_records(context)
+            return
+
+        paginator = self.get_new_paginator()
+        decorated_request = self.request_decorator(self._request)
+        rate_limits = self.tap_state["rate_limits"]
+        routing_value = self.routing_value(context)
+        lanes = self._tap.lane_executor
+        next_page = paginator.current_value
+        in_flight = deque()
+        pool = ThreadPoolExecutor(
+            max_workers=depth, thread_name_prefix=f"{self.name}-prefetch"
+        )
+
+        with metrics.http_request_counter(self.name, self.path) as request_counter:
+            request_counter.context = context
+            try:
+                while not paginator.finished:
+                    # Pages still in flight haven't been counted by Riot yet.
+                    room = rate_limits.remaining(routing_value, self.path)
+                    ahead = 1 if room is None else max(1, min(depth, room))
+                    while len(in_flight) < ahead:
+                        prepared_request = self.prepare_request(
+                            context, next_page_token=next_page
+                        )
+                        in_flight.append(
+                            (
+                                prepared_request,
+                                pool.submit(
+                                    decorated_request, prepared_request, context
+                                ),
+                            )
+                        )
+                        next_page += 1
+
+                    prepared_request, future = in_flight.popleft()
+                    with lanes.unlocked() if lanes else nullcontext():
+                        resp = future.result()
+                    request_counter.increment()
+                    self.update_sync_costs(prepared_request, resp, context)
+                    yield from self.parse_response(resp)
+                    paginator.advance(resp)
+            finally:
+                for _, future in in_flight:
+                    future.cancel()
+                with lanes.unlocked() if lanes else nullcontext():
+                    pool.shutdown(wait=True)
 
     def get_url_params(
         self,
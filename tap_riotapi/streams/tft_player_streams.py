@@ -4,6 +4,7 @@ from __future__ import annotations
 import logging
 import typing
 import typing as t
+from datetime import timedelta
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 from singer_sdk.helpers import types
@@ -13,7 +14,7 @@ from tap_riotapi.client import RiotAPIStream
 from singer_sdk.exceptions import FatalAPIError
 from tap_riotapi.streams.mixins.tft_endpts import TFTMatchDetailMixin
 from tap_riotapi.streams.mixins.match_history import TFTMatchListMixin
-from tap_riotapi.utils import flatten_config, REGION_ROUTING_MAP
+from tap_riotapi.utils import LazyList, REGION_ROUTING_MAP
 
 LOGGER = logging.getLogger(__name__)
 
@@ -35,15 +36,12 @@ class TFTPlayerByNameStream(RiotAPIStream):
     ).to_dict()
 
     @property
-    def url_base(self) -> str:
-        return "https://{region_routing_value}.api.riotgames.com"
+    def partitions(self) -> LazyList | None:
+        return LazyList(self._player_partitions)
 
-    @property
-    def partitions(self) -> list[dict] | None:
-
-        player_list = []
-        player_config, _, _ = flatten_config(self.config["following"])
-        for player in player_config:
+    def _player_partitions(self) -> t.Iterator[dict]:
+        shard = self._tap.shard
+        for player in self._tap.following_config.players:
             if "#" not in player["name"]:
                 LOGGER.info(f"MISSING TAGLINE - {player['name']}'")
                 continue
@@ -55,15 +53,35 @@ class TFTPlayerByNameStream(RiotAPIStream):
                 continue
             region = REGION_ROUTING_MAP[platform]
 
-            player_list.append(
-                {
-                    "gameName": name,
-                    "tagLine": tagline,
-                    "platform_routing_value": platform,
-                    "region_routing_value": region,
-                }
-            )
-        return player_list
+            partition = {
+                "gameName": name,
+                "tagLine": tagline,
+                "platform_routing_value": platform,
+                "region_routing_value": region,
+            }
+            if shard is None or shard.owns(partition):
+                yield partition
+
+    def generate_child_contexts(
+        self,
+        record: types.Record,
+        context: types.Context | None,
+    ) -> t.Iterable[types.Context | None]:
+        # A player whose last history check found nothing is only checked again
+        # once idle_player_recheck_hours have passed.
+        recheck_hours = self.config.get("idle_player_recheck_hours")
+        my_history_state = self.tap_state["player_match_history_state"].get(
+            record["puuid"], {}
+        )
+        if (
+            recheck_hours is not None
+            and my_history_state.get("idle")
+            and "last_processed" in my_history_state
+            and self._tap.end_timestamp - my_history_state["last_processed"]
+            < timedelta(hours=recheck_hours)
+        ):
+            return []
+        return [self.get_child_context(record=record, context=context)]
 
     def get_child_context(
         self,
@@ -72,10 +90,44 @@ class TFTPlayerByNameStream(RiotAPIStream):
     ) -> types.Context | None:
         return record | context
 
+    def post_process(
+        self,
+        row: dict,
+        context: types.Context | None = None,
+    ) -> dict | None:
+        record = super().post_process(row, context)
+        # Kept for the child context, so histories use the key that resolved it.
+        return record | {"api_key_id": row["api_key_id"]} if record else record
+
     def get_records(self, context: Context | None) -> t.Iterable[dict[str, t.Any]]:
 
+        if context is None or self._tap.run_budget.exhausted:
+            return
+        puuids = self.tap_state["riot_id_puuids"]
+        puuid = puuids.get(context["gameName"], context["tagLine"])
+        api_key_id = puuids.api_key_id(context["gameName"], context["tagLine"])
+        # A PUUID resolved with a key that's gone can't be used any more.
+        if puuid is not None and (
+            api_key_id is None or self.tap_state["rate_limits"].is_live(api_key_id)
+        ):
+            # Stands in for the account lookup, which would cost a request.
+            yield {
+                "data": {"puuid": puuid},
+                "url_params_used": {},
+                "api_key_id": api_key_id,
+            }
+            return
+
         try:
-            yield from super().request_records(context)
+            for record in super().request_records(context):
+                if record["data"]:
+                    puuids.put(
+                        context["gameName"],
+                        context["tagLine"],
+                        record["data"]["puuid"],
+                        api_key_id=record["api_key_id"],
+                    )
+                yield record
         except FatalAPIError as api_error:
             if "404 Client Error: Not Found for path" in str(api_error):
                 self.logger.warning(
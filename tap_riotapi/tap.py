@@ -2,14 +2,28 @@
 from __future__ import annotations
 
 from datetime import timedelta, timezone
+from functools import cached_property
 
+import click
 from singer_sdk.exceptions import ConfigValidationError
 from singer_sdk import Tap
 from singer_sdk import typing as th  # JSON schema typing helpers
 
 from tap_riotapi import streams
+from tap_riotapi.api_keys import ApiKeyPool
 from tap_riotapi.client import RiotAPIStream
-from tap_riotapi.rate_limiting import RateLimitState
+from tap_riotapi.concurrency import RoutingLaneExecutor
+from tap_riotapi.http_pool import SharedSession
+from tap_riotapi.match_detail_queue import MatchDetailQueue
+from tap_riotapi.match_id_set import MatchIdSet
+from tap_riotapi.pipeline import SyncPipeline
+from tap_riotapi.profiling import SyncProfiler
+from tap_riotapi.puuid_cache import PuuidCache
+from tap_riotapi.response_cache import MatchDetailCache
+from tap_riotapi.run_budget import RunBudget
+from tap_riotapi.sharding import Shard
+from tap_riotapi.state_writer import StateWriter
+from tap_riotapi.telemetry import RateLimitTelemetry
 from tap_riotapi.utils import *
 
 
@@ -18,27 +32,140 @@ class TapRiotAPI(Tap):
 
     message_writer_class = MessageWriter
 
+    # Set by --shard, which takes precedence over the shard setting.
+    cli_shard: str | None = None
+
     def __init__(self, **kwargs) -> None:
 
         super().__init__(**kwargs)
 
+        if self.config.get("fast_message_writer"):
+            self.message_writer = FastMessageWriter()
         self.initial_timestamp, self.end_timestamp = self._parse_time_range_config(
             self.config.get("start_date", None),
             self.config.get("end_date", None),
         )
+        self.match_detail_cache = None
+        if self.config.get("match_detail_cache_dir"):
+            self.match_detail_cache = MatchDetailCache(
+                self.config["match_detail_cache_dir"],
+                max_bytes=self.config.get("match_detail_cache_max_mb", 1024) << 20,
+            )
+        max_run_minutes = self.config.get("max_run_minutes")
+        self.run_budget = RunBudget(
+            max_requests=self.config.get("max_requests"),
+            max_seconds=max_run_minutes * 60 if max_run_minutes else None,
+        )
+        self.rate_limit_telemetry = RateLimitTelemetry(
+            prometheus_file=self.config.get("prometheus_file")
+        )
+        self.profiler = (
+            SyncProfiler(self.config["profile_dir"])
+            if self.config.get("profile_dir")
+            else None
+        )
+        self.http_session = SharedSession(
+            pool_size=self.config.get("http_pool_size", 10)
+        )
+        self.authenticator = None
+        self.pipeline = (
+            SyncPipeline(
+                profiler=self.profiler,
+                history_queue_size=self.config.get("pipeline_queue_size", 100),
+            )
+            if self.config.get("pipeline_sync")
+            else None
+        )
+        self.lane_executor = self.pipeline or (
+            RoutingLaneExecutor(profiler=self.profiler)
+            if self.config.get("concurrent_sync")
+            else None
+        )
+        self.state_writer = StateWriter(
+            self,
+            flush_records=self.config.get("state_flush_records"),
+            flush_seconds=self.config.get("state_flush_seconds"),
+            delta=self.config.get("delta_state", False),
+        )
         self.prune_state()
 
+    @cached_property
+    def following_config(self) -> FollowingConfig:
+        """Return the flattened ``following`` config, computed once per tap."""
+        return flatten_config(self.config["following"])
+
+    @cached_property
+    def shard(self) -> Shard | None:
+        """Return the shard of the sync this run covers, if sharded."""
+        spec = self.cli_shard or self.config.get("shard")
+        if not spec:
+            return None
+        return Shard.parse(
+            spec,
+            by=self.config.get("shard_by", "region"),
+            platforms=tuple(self.config["following"]),
+        )
+
+    @classmethod
+    def get_singer_command(cls) -> click.Command:
+        command = super().get_singer_command()
+        command.params.append(
+            click.Option(
+                ["--shard"],
+                help=(
+                    "Sync only shard i of N, e.g. 2/4. Overrides the shard setting."
+                ),
+            )
+        )
+        return command
+
+    @classmethod
+    def invoke(cls, *, shard: str | None = None, **kwargs) -> None:
+        cls.cli_shard = shard
+        super().invoke(**kwargs)
+
     def prune_state(self) -> None:
         """Prune state to remove old entries."""
         for item in self.state["player_match_history_state"].values():
             if "last_processed" in item and item["last_processed"] < self.initial_timestamp:
                 del item["last_processed"]
+        self.state["match_detail_set"].evict_before(self.initial_timestamp.date())
+        # A bookmark pinned to a key that's no longer configured can't be
+        # resumed, as its PUUID is encrypted for that key.
+        keys = self.state["rate_limits"]
+        for stream_state in self.state.get("bookmarks", {}).values():
+            if "partitions" in stream_state:
+                stream_state["partitions"] = [
+                    partition
+                    for partition in stream_state["partitions"]
+                    if "api_key_id" not in partition.get("context", {})
+                    or keys.is_live(partition["context"]["api_key_id"])
+                ]
 
     def load_state(self, state: dict[str, t.Any]) -> None:
+        if state.get("delta"):
+            # A delta holds only what changed since the full state before it;
+            # loaded on its own, everything else would be silently lost.
+            raise ValueError(
+                "The state is a delta STATE message from a run with delta_state "
+                "on, not a full state. Merge it into the full state written "
+                "before it, e.g. with `python -m tap_riotapi.state_writer "
+                "full.json delta.json > state.json` (apply_state_delta), and "
+                "start from the result."
+            )
         super().load_state(state)
 
-        if not "rate_limits" in self.state:
-            self.state["rate_limits"] = RateLimitState()
+        pacing = self.config.get("rate_limit_pacing")
+        if pacing is not None and not 0 < pacing <= 1:
+            raise ConfigValidationError(
+                "rate_limit_pacing must be a fraction of the rate cap, e.g. 0.9"
+            )
+        raw_rate_limits = state.get("rate_limits")
+        self.state["rate_limits"] = ApiKeyPool.from_dict(
+            [self.config["auth_token"], *self.config.get("auth_tokens", [])],
+            raw_rate_limits if isinstance(raw_rate_limits, dict) else {},
+            pacing=pacing,
+        )
 
         self.state["player_match_history_state"] = state.get(
             "player_match_history_state", {}
@@ -48,10 +175,40 @@ class TapRiotAPI(Tap):
                 item["last_processed"] = datetime.fromisoformat(item["last_processed"])
 
         raw_match_detail = state.get("match_detail_set")
-        if raw_match_detail:
-            self.state["match_detail_set"] = set(json.loads(raw_match_detail))
+        if isinstance(raw_match_detail, str):
+            # States written before the compact format hold a JSON list.
+            self.state["match_detail_set"] = MatchIdSet.from_ids(
+                json.loads(raw_match_detail)
+            )
         else:
-            self.state["match_detail_set"] = set()
+            self.state["match_detail_set"] = MatchIdSet.from_dict(
+                raw_match_detail or {}
+            )
+
+        self.state["riot_id_puuids"] = PuuidCache.from_dict(
+            state.get("riot_id_puuids", {}),
+            ttl_days=self.config.get("puuid_cache_ttl_days", 30),
+            refresh=self.config.get("refresh_puuid_cache", False),
+        )
+
+        if self.shard is not None:
+            # Tells merge_shard_states which bookmarks this shard kept up to date.
+            self.state["shard"] = self.shard._asdict()
+        else:
+            self.state.pop("shard", None)
+
+        raw_queue = state.get("match_detail_queue", {})
+        if self.shard is not None:
+            # Matches queued by other shards are theirs to fetch.
+            raw_queue = {
+                region: [item for item in items if self.shard.owns(item["context"])]
+                for region, items in raw_queue.items()
+            }
+        self.state["match_detail_queue"] = MatchDetailQueue.from_dict(
+            raw_queue,
+            tap=self,
+            batch_size=self.config.get("match_detail_batch_size", 100),
+        )
 
     @classmethod
     def _parse_time_range_config(cls, start_config: str | None, end_config: str | None):
@@ -88,8 +245,332 @@ class TapRiotAPI(Tap):
             title="Auth Token",
             description="The token to authenticate against the API service",
         ),
+        th.Property(
+            "auth_tokens",
+            th.ArrayType(th.StringType),
+            required=False,
+            secret=True,
+            title="Additional Auth Tokens",
+            description=(
+                "More API keys to pool with auth_token. Each key has its own "
+                "rate limits, and each request goes to the key that can send it "
+                "soonest. A key that gets a 401 or 403 response is retired for "
+                "the rest of the run. Riot encrypts PUUIDs per application, so "
+                "a player's match history is requested with the key their PUUID "
+                "was resolved with, and is left for the next run if that key is "
+                "retired. Match details are fetched with any key, or served from "
+                "match_detail_cache_dir, so the participant PUUIDs in them can be "
+                "encrypted for different keys from one record to the next."
+            ),
+        ),
         th.Property("following", th.ObjectType(), required=True),
         th.Property("start_date", th.DateType, required=False),
+        th.Property(
+            "api_base_url",
+            th.StringType,
+            required=False,
+            title="API Base URL",
+            description=(
+                "Root of the API, with {routing_value} standing in for the region "
+                "or platform. Defaults to https://{routing_value}.api.riotgames.com; "
+                "point it at a local stand-in server for testing."
+            ),
+        ),
+        th.Property(
+            "concurrent_sync",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Concurrent Sync",
+            description=(
+                "Sync partitions on one worker lane per routing value, so that "
+                "regions and platforms wait on their own rate limits side by side."
+            ),
+        ),
+        th.Property(
+            "pipeline_sync",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Pipeline Sync",
+            description=(
+                "Run the ladder, match history and match detail stages side by "
+                "side, each on its own worker per region, instead of syncing "
+                "each player's history and matches inline. The stages use "
+                "different method rate limits, so together they use more of the "
+                "app rate limit. Implies concurrent_sync."
+            ),
+        ),
+        th.Property(
+            "pipeline_queue_size",
+            th.IntegerType,
+            required=False,
+            default=100,
+            title="Pipeline Queue Size",
+            description=(
+                "Players the ladder stage may get ahead of the match history "
+                "stage, per region, in pipeline mode. The match history stage "
+                "gets at most match_detail_batch_size matches ahead of the match "
+                "detail stage."
+            ),
+        ),
+        th.Property(
+            "http_pool_size",
+            th.IntegerType,
+            required=False,
+            default=10,
+            title="HTTP Pool Size",
+            description=(
+                "Keep-alive connections to keep open per API host. All streams "
+                "share them, so raise it when lanes, ladder page prefetching and "
+                "match detail fetches run against the same host at once."
+            ),
+        ),
+        th.Property(
+            "rate_limit_pacing",
+            th.NumberType,
+            required=False,
+            title="Rate Limit Pacing",
+            description=(
+                "Target fraction of each rate cap to use, e.g. 0.9. When set, "
+                "requests are spaced evenly across the tightest rate limit window "
+                "instead of bursting until a bucket is empty and then sleeping."
+            ),
+        ),
+        th.Property(
+            "shard",
+            th.StringType,
+            required=False,
+            title="Shard",
+            description=(
+                "Sync only shard i of N, e.g. 2/4, so that a sync can be split "
+                "across processes. Followed players and ladders are split "
+                "between the shards deterministically, and each shard writes its "
+                "own state. Merge the shards' final states with "
+                "`python -m tap_riotapi.sharding` before the next run. Can also "
+                "be given as --shard on the command line."
+            ),
+        ),
+        th.Property(
+            "shard_by",
+            th.StringType,
+            required=False,
+            default="region",
+            allowed_values=["region", "partition"],
+            title="Shard By",
+            description=(
+                "How to split a sharded sync. 'region' deals whole regions out "
+                "to the shards, so they never share rate limits or matches. "
+                "'partition' splits each player and ladder by hash, spreading "
+                "a region over every shard, but shards can then fetch the same "
+                "match and share each region's rate limits, unless each shard "
+                "is given its own API keys."
+            ),
+        ),
+        th.Property(
+            "ladder_prefetch_pages",
+            th.IntegerType,
+            required=False,
+            title="Ladder Prefetch Pages",
+            description=(
+                "Number of normal tier ladder pages to have in flight at once. "
+                "Pages are fetched ahead only as far as the platform's rate "
+                "limits have room for, and are still emitted in order. By "
+                "default, pages are fetched one at a time."
+            ),
+        ),
+        th.Property(
+            "prioritize_ladder_players",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Prioritize Ladder Players",
+            description=(
+                "Sync ladder players' match histories once the whole ladder is "
+                "known, players expected to have the most new matches first, so "
+                "a run cut short has still captured most of them. Every player "
+                "with new ranked games is held in memory until then."
+            ),
+        ),
+        th.Property(
+            "max_requests",
+            th.IntegerType,
+            required=False,
+            title="Max Requests",
+            description=(
+                "Stop the run once this many requests have been sent. Requests "
+                "already under way finish, and whatever is left, including "
+                "player histories stopped between pages and queued match "
+                "details, is kept in state for the next run to carry on with."
+            ),
+        ),
+        th.Property(
+            "max_run_minutes",
+            th.NumberType,
+            required=False,
+            title="Max Run Minutes",
+            description=(
+                "Stop the run once it has been going for this many minutes, "
+                "the same way as max_requests. The final STATE message still "
+                "goes out, so the next run picks up where this one stopped."
+            ),
+        ),
+        th.Property(
+            "match_detail_batch_size",
+            th.IntegerType,
+            required=False,
+            default=100,
+            title="Match Detail Batch Size",
+            description=(
+                "Number of unique matches to queue up per region before fetching "
+                "their details in one batch."
+            ),
+        ),
+        th.Property(
+            "match_detail_cache_dir",
+            th.StringType,
+            required=False,
+            title="Match Detail Cache Directory",
+            description=(
+                "Directory to keep compressed match detail responses in. Matches "
+                "found there are not requested again, and don't count against the "
+                "rate limits."
+            ),
+        ),
+        th.Property(
+            "match_detail_cache_max_mb",
+            th.IntegerType,
+            required=False,
+            default=1024,
+            title="Match Detail Cache Size (MB)",
+            description=(
+                "Size cap for the match detail cache. The least recently used "
+                "matches are evicted beyond it."
+            ),
+        ),
+        th.Property(
+            "fast_json",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Fast JSON",
+            description=(
+                "Decode API responses with orjson, if it is installed. Install "
+                "the tap with the 'fast' extra to get it."
+            ),
+        ),
+        th.Property(
+            "fast_message_writer",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Fast Message Writer",
+            description=(
+                "Serialise messages with orjson, if it is installed, and write them "
+                "to stdout in large buffered chunks. Buffers are flushed at least "
+                "once a second and after every STATE message."
+            ),
+        ),
+        th.Property(
+            "state_flush_records",
+            th.IntegerType,
+            required=False,
+            title="State Flush Records",
+            description=(
+                "Write a STATE message at most once per this many records. By "
+                "default, state is written whenever a stream has new state."
+            ),
+        ),
+        th.Property(
+            "state_flush_seconds",
+            th.NumberType,
+            required=False,
+            title="State Flush Seconds",
+            description=(
+                "Write a STATE message at most once per this many seconds. "
+                "Combined with state_flush_records, whichever comes first."
+            ),
+        ),
+        th.Property(
+            "delta_state",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Delta State",
+            description=(
+                "Between the full STATE messages that open the sync and close "
+                "each top-level stream, write only what changed, marked with "
+                "\"delta\": true. The consumer has to merge these into the last "
+                "full state. Meltano saves the last STATE message as it is, so a "
+                "run killed mid-stream leaves a delta behind, which the tap "
+                "refuses to start from until it's merged with "
+                "`python -m tap_riotapi.state_writer`."
+            ),
+        ),
+        th.Property(
+            "prometheus_file",
+            th.StringType,
+            required=False,
+            title="Prometheus File",
+            description=(
+                "File to write rate limit telemetry to, in the Prometheus text "
+                "format, e.g. for the node exporter's textfile collector. It is "
+                "rewritten at the end of each top-level stream. The same numbers "
+                "are always logged as METRIC messages."
+            ),
+        ),
+        th.Property(
+            "idle_player_recheck_hours",
+            th.NumberType,
+            required=False,
+            title="Idle Player Recheck Hours",
+            description=(
+                "Skip the match history of followed players whose last check "
+                "found no new matches until this many hours have passed since "
+                "that check. Nothing is missed, since the next check covers the "
+                "whole gap. By default, every followed player is checked on "
+                "every run."
+            ),
+        ),
+        th.Property(
+            "puuid_cache_ttl_days",
+            th.IntegerType,
+            required=False,
+            default=30,
+            title="PUUID Cache TTL (days)",
+            description=(
+                "How long a player's Riot ID to PUUID lookup is kept in state. "
+                "Players with a cached PUUID are not looked up again until it "
+                "expires. Set to 0 to look every player up on every run."
+            ),
+        ),
+        th.Property(
+            "refresh_puuid_cache",
+            th.BooleanType,
+            required=False,
+            default=False,
+            title="Refresh PUUID Cache",
+            description=(
+                "Look up every player's PUUID again on this run, e.g. after a "
+                "player moved their Riot ID to another account."
+            ),
+        ),
+        th.Property(
+            "profile_dir",
+            th.StringType,
+            required=False,
+            title="Profile Directory",
+            description=(
+                "Profile each top-level stream's sync with cProfile and write a "
+                "<stream>.prof and a <stream>.txt report to this directory. The "
+                "report splits the time into network wait, rate limit sleep, JSON "
+                "decode, post_process, state bookkeeping and message "
+                "serialisation, and lists the CPU hot spots. Profiling slows the "
+                "sync down considerably. With concurrent_sync or pipeline_sync on "
+                "Python 3.12+, one profiler covers every lane, and calls made on "
+                "different lanes at once can be attributed to the wrong caller."
+            ),
+        ),
     ).to_dict()
 
     def discover_streams(self) -> list[RiotAPIStream]:
@@ -103,9 +584,7 @@ class TapRiotAPI(Tap):
         if not "following" in self.config:
             raise ConfigValidationError("No streams configured!")
 
-        player_config, apex_league_config, reg_league_config = flatten_config(
-            self.config["following"]
-        )
+        player_config, apex_league_config, reg_league_config = self.following_config
 
         if player_config:
             stream_types.extend(streams.TFT_PLAYER_STREAMS)
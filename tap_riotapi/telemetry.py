@@ -0,0 +1,180 @@
+"""Rate limit telemetry, per routing value and endpoint."""
+
+from __future__ import annotations
+
+import enum
+import os
+import threading
+from dataclasses import dataclass, fields
+
+from singer_sdk import metrics
+
+from tap_riotapi.rate_limiting import _RateLimitRecord
+
+
+class RateLimitMetric(str, enum.Enum):
+    """Metrics reported by ``RateLimitTelemetry``."""
+
+    REQUESTS = "rate_limit_requests"
+    SLEEPS = "rate_limit_sleep_count"
+    SLEEP_SECONDS = "rate_limit_sleep_seconds"
+    THROTTLED = "rate_limit_throttled_count"
+    RETRY_AFTER_SECONDS = "rate_limit_retry_after_seconds"
+    UTILISATION = "rate_limit_utilisation"
+    PEAK_UTILISATION = "rate_limit_peak_utilisation"
+
+
+@dataclass
+class _EndpointStats:
+
+    requests: int = 0
+    sleeps: int = 0
+    sleep_seconds: float = 0.0
+    throttled: int = 0
+    retry_after_seconds: float = 0.0
+
+
+_COUNTERS = {
+    "requests": RateLimitMetric.REQUESTS,
+    "sleeps": RateLimitMetric.SLEEPS,
+    "sleep_seconds": RateLimitMetric.SLEEP_SECONDS,
+    "throttled": RateLimitMetric.THROTTLED,
+    "retry_after_seconds": RateLimitMetric.RETRY_AFTER_SECONDS,
+}
+
+
+class RateLimitTelemetry:
+    """Where a sync's time went, as far as rate limits are concerned.
+
+    Per routing value and endpoint, counts requests, limiter sleeps and the time
+    slept, and 429s and the ``Retry-After`` seconds they asked for. Per bucket,
+    i.e. the app buckets of a routing value or the method buckets of an
+    endpoint, tracks the last and peak fraction of the cap Riot reported in use.
+
+    ``report`` logs it all as Singer METRIC messages and, if ``prometheus_file``
+    is set, writes it there in the Prometheus text format. Safe to share between
+    lanes.
+    """
+
+    def __init__(self, prometheus_file: str | None = None):
+
+        self.prometheus_file = prometheus_file
+        self._lock = threading.Lock()
+        self._endpoints: dict[tuple[str, str], _EndpointStats] = {}
+        # (routing value, "app" or endpoint, window seconds) -> (last, peak)
+        self._utilisation: dict[tuple[str, str, str], tuple[float, float]] = {}
+
+    def _stats(self, routing_value: str, endpoint: str) -> _EndpointStats:
+        key = (routing_value, endpoint)
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = _EndpointStats()
+        return stats
+
+    def log_request(self, routing_value: str, endpoint: str, wait: float) -> None:
+        """Count a request that first slept ``wait`` seconds in the limiter."""
+        with self._lock:
+            stats = self._stats(routing_value, endpoint)
+            stats.requests += 1
+            if wait > 0:
+                stats.sleeps += 1
+                stats.sleep_seconds += wait
+
+    def log_throttled(
+        self, routing_value: str, endpoint: str, retry_after: float | None
+    ) -> None:
+        """Count a 429 response."""
+        with self._lock:
+            stats = self._stats(routing_value, endpoint)
+            stats.throttled += 1
+            stats.retry_after_seconds += retry_after or 0.0
+
+    def log_response(
+        self,
+        routing_value: str,
+        rate_limit: _RateLimitRecord,
+        endpoint: str | None = None,
+    ) -> None:
+        """Track the utilisation reported in a response's rate limit headers."""
+        key = endpoint if endpoint else "app"
+        caps = dict(
+            reversed(item.split(":")) for item in rate_limit.rate_cap.split(",")
+        )
+        with self._lock:
+            for item in rate_limit.rate_count.split(","):
+                count, _, size = item.partition(":")
+                if size not in caps:
+                    continue
+                utilisation = int(count) / int(caps[size])
+                _, peak = self._utilisation.get((routing_value, key, size), (0.0, 0.0))
+                self._utilisation[routing_value, key, size] = (
+                    utilisation,
+                    max(peak, utilisation),
+                )
+
+    def points(self) -> list[metrics.Point]:
+        with self._lock:
+            points = []
+            for (routing_value, endpoint), stats in self._endpoints.items():
+                tags = {"routing_value": routing_value, "endpoint": endpoint}
+                for field in fields(stats):
+                    points.append(
+                        metrics.Point(
+                            "counter",
+                            _COUNTERS[field.name],
+                            round(getattr(stats, field.name), 3),
+                            tags,
+                        )
+                    )
+            for (routing_value, key, size), values in self._utilisation.items():
+                tags = {"routing_value": routing_value, "bucket": key, "window": size}
+                for metric, value in zip(
+                    (RateLimitMetric.UTILISATION, RateLimitMetric.PEAK_UTILISATION),
+                    values,
+                ):
+                    points.append(metrics.Point("gauge", metric, round(value, 4), tags))
+            return points
+
+    def report(self) -> None:
+        """Log every metric, and write the Prometheus file if there is one."""
+        points = self.points()
+        logger = metrics.get_metrics_logger()
+        for point in points:
+            metrics.log(logger, point)
+        if self.prometheus_file:
+            self._write_prometheus(points)
+
+    def _write_prometheus(self, points: list[metrics.Point]) -> None:
+        lines = []
+        seen = set()
+        for point in points:
+            name = f"tap_riotapi_{point.metric.value}"
+            if point.metric_type == "counter":
+                name += "_total"
+            if name not in seen:
+                seen.add(name)
+                prometheus_type = (
+                    "counter" if point.metric_type == "counter" else "gauge"
+                )
+                lines.append(f"# TYPE {name} {prometheus_type}")
+            labels = ",".join(
+                f'{key}="{_escape(str(value))}"' for key, value in point.tags.items()
+            )
+            lines.append(f"{name}{{{labels}}} {point.value}")
+
+        # Written aside and moved into place, so a scraper never sees half a file.
+        partial = f"{self.prometheus_file}.tmp"
+        with open(partial, "w") as file:
+            file.write("\n".join(sorted(lines, key=_metric_name)) + "\n")
+        os.replace(partial, self.prometheus_file)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(line: str) -> tuple[str, int]:
+    # Keeps each metric's TYPE line directly ahead of its samples.
+    if line.startswith("# TYPE "):
+        return line.split(" ")[2], 0
+    return line.split("{", 1)[0], 1
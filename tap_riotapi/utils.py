@@ -1,42 +1,97 @@
+import abc
 import csv
 import json
+import sys
 from datetime import datetime
-from singer_sdk.singerlib import Message
+from time import monotonic
+from singer_sdk.singerlib import Message, StateMessage
 from singer_sdk.io_base import SingerWriter
+from requests import Response
 import typing as t
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
-def load_player_file(filepath: str | None) -> list[str]:
+
+def load_player_file(filepath: str | None) -> t.Iterator[str]:
     if not filepath:
-        return []
+        return
     with open(filepath, newline="") as f:
-        return [f"{row[0]}#{row[1]}" for row in csv.reader(f)]
+        for row in csv.reader(f):
+            yield f"{row[0]}#{row[1]}"
+
+
+class LazyList:
+    """A list that is generated on every iteration rather than kept in memory.
+
+    ``factory`` returns a fresh iterator each time. Truthiness only generates
+    the first item, so ``partitions or [{}]`` and the like stay cheap.
+    """
+
+    def __init__(self, factory: t.Callable[[], t.Iterator]):
+        self._factory = factory
+
+    def __iter__(self) -> t.Iterator:
+        return self._factory()
+
+    def __bool__(self) -> bool:
+        return next(iter(self), None) is not None
+
+
+class FollowingConfig(t.NamedTuple):
 
+    players: LazyList
+    apex_leagues: list[dict]
+    reg_leagues: list[dict]
 
-def flatten_config(config_dict: dict[str, dict[str, list]]) -> tuple:
 
-    players = []
+def flatten_config(config_dict: dict[str, dict[str, list]]) -> FollowingConfig:
+    """Split the ``following`` config into players, apex and regular leagues.
+
+    Players are only read, from their inline lists and player files, as they
+    are iterated over, so large player files are never held in memory.
+    """
+
+    def players():
+        for region, region_config_dict in config_dict.items():
+            base = {"region": region}
+            for p in region_config_dict.get("players", []):
+                yield base | {"name": p}
+            for p in load_player_file(region_config_dict.get("player_list_file")):
+                yield base | {"name": p}
+
     apex_leagues = []
     reg_leagues = []
     for region, region_config_dict in config_dict.items():
         base = {"region": region}
-        inline_players = region_config_dict.get("players", [])
-        file_players = load_player_file(region_config_dict.get("player_list_file"))
-        players.extend(
-            [base | {"name": p} for p in inline_players + file_players]
-        )
         for item in region_config_dict.get("leagues", []):
             if item["name"] in APEX_TIERS:
                 apex_leagues.append(item | base)
             elif item["name"] in NON_APEX_TIERS:
                 reg_leagues.append(item | base)
 
-    return players, apex_leagues, reg_leagues
+    return FollowingConfig(LazyList(players), apex_leagues, reg_leagues)
 
 
 ROMAN_NUMERALS = {1: "I", 2: "II", 3: "III", 4: "IV"}
 NON_APEX_TIERS = {"diamond", "emerald", "platinum", "gold", "silver", "bronze", "iron"}
 APEX_TIERS = {"challenger", "grandmaster", "master"}
+TIER_ORDER = (
+    "challenger",
+    "grandmaster",
+    "master",
+    "diamond",
+    "emerald",
+    "platinum",
+    "gold",
+    "silver",
+    "bronze",
+    "iron",
+)
+
+API_BASE_URL = "https://{routing_value}.api.riotgames.com"
 
 REGION_ROUTING_MAP = {
     "pbe": "americas",
@@ -58,6 +113,48 @@ REGION_ROUTING_MAP = {
 }
 
 
+def response_json(response: Response, fast: bool = False) -> t.Any:  # noqa: ANN401
+    """Return the decoded JSON body of ``response``, decoding it only once.
+
+    The stream and its paginator both need the body, so the first decode is kept
+    on the response.
+
+    Args:
+        response: The HTTP ``requests.Response`` object.
+        fast: Decode with orjson if it is installed.
+
+    Returns:
+        The decoded body.
+    """
+    try:
+        return response._decoded_json
+    except AttributeError:
+        pass
+    if fast and orjson is not None:
+        decoded = orjson.loads(response.content)
+    else:
+        decoded = response.json()
+    response._decoded_json = decoded
+    return decoded
+
+
+class StateValue(abc.ABC):
+    """An object kept in tap state, written to STATE messages as its ``to_dict()``.
+
+    The SDK deep-copies tap state for every STATE message it writes. Copying
+    the object itself would copy all of its internals, locks included, while
+    lanes may be updating it, so the copy is its ``to_dict()`` form instead:
+    exactly what gets written, built under whatever locking ``to_dict`` does.
+    """
+
+    @abc.abstractmethod
+    def to_dict(self) -> t.Any:  # noqa: ANN401
+        """Return the object as it's written to STATE messages."""
+
+    def __deepcopy__(self, memo: dict) -> t.Any:  # noqa: ANN401
+        return self.to_dict()
+
+
 def default_encoding(obj: t.Any) -> str:  # noqa: ANN401
     """Default JSON encoder.
 
@@ -69,6 +166,9 @@ def default_encoding(obj: t.Any) -> str:  # noqa: ANN401
     """
     if isinstance(obj, datetime):
         return obj.isoformat(sep="T")
+    if hasattr(obj, "to_dict"):
+        # State objects that know their own JSON form, e.g. RateLimitState.
+        return obj.to_dict()
     if isinstance(obj, set):
         return json.dumps(
             list(obj),
@@ -90,9 +190,72 @@ class MessageWriter(SingerWriter):
         Returns:
             A string of serialized json.
         """
+        if isinstance(message, StateMessage):
+            # to_dict() would deep-copy the whole tap state first.
+            message_dict = {"type": "STATE", "value": message.value}
+        else:
+            message_dict = message.to_dict()
         value = json.dumps(
-            message.to_dict(),
+            message_dict,
             default=default_encoding,
             separators=(",", ":")
         )
-        return value
\ No newline at end of file
+        return value
+
+
+class FastMessageWriter(MessageWriter):
+    """Message writer serialising with orjson and buffering stdout.
+
+    orjson encodes ``datetime`` values itself, so ``default_encoding`` is only
+    called for state objects. Encoded messages are held in memory and written
+    out once ``buffer_size`` bytes are waiting, once ``flush_interval`` seconds
+    have passed since the last write, and after every STATE message, so state is
+    never emitted ahead of the records it covers.
+
+    Falls back to ``MessageWriter`` encoding if orjson isn't installed.
+    """
+
+    def __init__(self, buffer_size: int = 1 << 20, flush_interval: float = 1.0):
+
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer: list[bytes] = []
+        self._buffered = 0
+        self._last_flush = monotonic()
+
+    def serialize_message(self, message: Message) -> bytes:  # type: ignore[override]
+        if orjson is None:
+            return super().serialize_message(message).encode()
+        if isinstance(message, StateMessage):
+            message_dict = {"type": "STATE", "value": message.value}
+        else:
+            message_dict = message.to_dict()
+        return orjson.dumps(message_dict, default=default_encoding)
+
+    def write_message(self, message: Message) -> None:
+        line = self.format_message(message)
+        self._buffer.append(line)
+        self._buffer.append(b"\n")
+        self._buffered += len(line) + 1
+        if (
+            isinstance(message, StateMessage)
+            or self._buffered >= self.buffer_size
+            or monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out every buffered message."""
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        self._last_flush = monotonic()
+        # Anything written straight to sys.stdout has to go out first.
+        sys.stdout.flush()
+        stream = getattr(sys.stdout, "buffer", None)
+        if stream is None:  # e.g. stdout redirected to a StringIO
+            sys.stdout.write(data.decode())
+            sys.stdout.flush()
+        else:
+            stream.write(data)
+            stream.flush()
@@ -0,0 +1,67 @@
+"""Tests for pooling API keys."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from tap_riotapi import rate_limiting
+from tap_riotapi.api_keys import ApiKeyPool, RetiredKeyError, key_id
+from tap_riotapi.rate_limiting import _RateLimitRecord
+
+MATCH_DETAIL = "/tft/match/v1/matches/{matchId}"
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(rate_limiting, "monotonic", lambda: 1000.0)
+
+
+def record(rate_count: str) -> _RateLimitRecord:
+    return _RateLimitRecord(datetime.now(timezone.utc), "20:1,100:120", rate_count)
+
+
+def test_requests_go_to_the_key_that_can_send_soonest():
+    pool = ApiKeyPool(["one", "two"])
+    pool.log_response("one", "americas", record("1:1,100:120"))
+    pool.log_response("two", "americas", record("1:1,10:120"))
+    assert pool.request_wait("americas", MATCH_DETAIL) == ("two", 0.0)
+    assert pool.remaining("americas", MATCH_DETAIL) == 19
+
+    # Both free to send, so the one with more room left goes first.
+    pool.log_response("one", "americas", record("1:1,5:120"))
+    assert pool.request_wait("americas", MATCH_DETAIL) == ("one", 0.0)
+
+
+def test_retires_keys_but_never_the_last_one():
+    pool = ApiKeyPool(["one", "two"])
+    assert pool.retire("one", 403)
+    assert pool.request_wait("americas", MATCH_DETAIL)[0] == "two"
+    assert not pool.retire("two", 401)
+    assert len(pool) == 1
+
+
+def test_state_is_kept_per_key():
+    pool = ApiKeyPool(["one", "two"])
+    pool.log_response("two", "europe", record("3:1,7:120"))
+    state = pool.to_dict()
+    assert state[key_id("one")] == {}
+
+    restored = ApiKeyPool.from_dict(["two", "three"], state)
+    assert restored.remaining("europe", MATCH_DETAIL) == 17
+    assert list(restored.to_dict()) == [key_id("two"), key_id("three")]
+
+    # A state from before keys were pooled belongs to the first key.
+    legacy = ApiKeyPool.from_dict(["one"], state[key_id("two")])
+    assert legacy.remaining("europe", MATCH_DETAIL) == 17
+
+
+def test_requests_can_be_pinned_to_a_live_key():
+    pool = ApiKeyPool(["one", "two"])
+    pool.log_response("one", "americas", record("1:1,100:120"))
+    assert pool.request_wait("americas", MATCH_DETAIL, key=key_id("one"))[0] == "one"
+
+    # No other key can send a PUUID resolved with a retired one.
+    pool.retire("one", 403)
+    assert not pool.is_live(key_id("one"))
+    with pytest.raises(RetiredKeyError):
+        pool.request_wait("americas", MATCH_DETAIL, key=key_id("one"))
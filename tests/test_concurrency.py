@@ -0,0 +1,45 @@
+"""Tests for the routing lane executor."""
+
+import threading
+
+import pytest
+
+from tap_riotapi.concurrency import RoutingLaneExecutor
+
+
+def test_lanes_release_the_lock_around_requests():
+    lanes = RoutingLaneExecutor()
+    # Both lanes only get past the barrier if neither holds the lock meanwhile.
+    in_flight = threading.Barrier(2, timeout=5)
+
+    def request():
+        with lanes.unlocked():
+            in_flight.wait()
+
+    lanes.run_lanes({"americas": [request], "europe": [request]}, name="test")
+
+
+def test_lane_error_aborts_the_other_lanes():
+    lanes = RoutingLaneExecutor()
+    waiting, failing = threading.Event(), threading.Event()
+    done = []
+
+    def fail():
+        with lanes.unlocked():
+            waiting.wait(timeout=5)
+        failing.set()
+        raise ValueError("lane failed")
+
+    def wait_for_failure():
+        waiting.set()
+        with lanes.unlocked():
+            failing.wait(timeout=5)
+        done.append("first")
+
+    jobs = [wait_for_failure] + [lambda: done.append("later")] * 3
+    with pytest.raises(ValueError, match="lane failed"):
+        lanes.run_lanes({"americas": [fail], "europe": jobs}, name="test")
+
+    # The failing lane flags the abort before it lets go of the lock, so the
+    # other lane finishes the job it's in and stops there.
+    assert done == ["first"]
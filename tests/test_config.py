@@ -0,0 +1,34 @@
+"""Tests for flattening the ``following`` config."""
+
+from tap_riotapi.utils import flatten_config
+
+
+def test_players_are_streamed_from_file_on_each_iteration(tmp_path):
+    player_file = tmp_path / "players.csv"
+    player_file.write_text("one,NA1\ntwo,NA1\n")
+    config = flatten_config(
+        {
+            "NA1": {
+                "players": ["inline#NA1"],
+                "player_list_file": str(player_file),
+                "leagues": [{"name": "challenger"}, {"name": "iron", "division": 4}],
+            }
+        }
+    )
+
+    assert [player["name"] for player in config.players] == [
+        "inline#NA1",
+        "one#NA1",
+        "two#NA1",
+    ]
+    player_file.write_text("three,NA1\n")
+    assert [player["name"] for player in config.players] == [
+        "inline#NA1",
+        "three#NA1",
+    ]
+    assert config.apex_leagues == [{"name": "challenger", "region": "NA1"}]
+    assert config.reg_leagues == [{"name": "iron", "division": 4, "region": "NA1"}]
+
+
+def test_empty_player_list_is_falsy():
+    assert not flatten_config({"NA1": {"leagues": []}}).players
@@ -0,0 +1,361 @@
+"""End-to-end sync against the local stand-in Riot API."""
+
+import io
+import json
+from contextlib import redirect_stdout
+
+import pytest
+
+from benchmarks.end_to_end import tap_config
+from benchmarks.mock_riot_api import MockRiotAPI, SyntheticWorld
+from tap_riotapi.api_keys import key_id
+from tap_riotapi.sharding import merge_shard_states
+from tap_riotapi.state_writer import apply_state_delta
+from tap_riotapi.tap import TapRiotAPI
+
+
+def sync(config: dict, state: dict | None = None) -> list[dict]:
+    output = io.StringIO()
+    with redirect_stdout(output):
+        TapRiotAPI(config=config, state=state or {}, parse_env_config=False).sync_all()
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def records(messages: list[dict]) -> list[str]:
+    # History records carry the sync's end time, so only ladders and details
+    # compare between runs.
+    return sorted(
+        json.dumps([message["stream"], message["record"]], sort_keys=True)
+        for message in messages
+        if message["type"] == "RECORD"
+        and message["stream"].endswith(("ladder", "match_detail"))
+    )
+
+
+def test_syncs_each_match_once():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        messages = sync(tap_config(api.url, players=2, overrides={}))
+
+    records = [message for message in messages if message["type"] == "RECORD"]
+    ladder = [r for r in records if r["stream"] == "normal_ranked_ladder"]
+    match_ids = [
+        r["record"]["metadata"]["match_id"]
+        for r in records
+        if r["stream"].endswith("match_detail")
+    ]
+    # NA1 and EUW1 each follow one iron division.
+    assert len(ladder) == 24
+    assert match_ids
+    assert len(match_ids) == len(set(match_ids))
+
+
+def test_histories_are_requested_with_the_key_that_resolved_the_puuid():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+
+    def match_ids(messages):
+        return sorted(
+            message["record"]["metadata"]["match_id"]
+            for message in messages
+            if message["type"] == "RECORD" and message["stream"].endswith("detail")
+        )
+
+    with MockRiotAPI(world) as api:
+        expected = match_ids(sync(tap_config(api.url, players=2, overrides={})))
+    # A PUUID sent with the other key than the one that resolved it gets a 400.
+    with MockRiotAPI(world, encrypt_puuids=True) as api:
+        config = tap_config(api.url, players=2, overrides={"auth_tokens": ["other"]})
+        messages = sync(config)
+        state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+        # Followed players are checked again with the PUUIDs cached in state.
+        requests = api.requests
+        sync(config, state)
+
+    assert match_ids(messages) == expected
+    assert api.requests > requests
+
+
+def test_histories_pinned_to_a_retired_key_are_left_for_the_next_run():
+    class RevokingAPI(MockRiotAPI):
+        # The first key is revoked once the ladders are in.
+        def handle(self, request_path, token):
+            if "/by-puuid/" in request_path:
+                self.revoked_keys.add("mock")
+            return super().handle(request_path, token)
+
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with RevokingAPI(world, encrypt_puuids=True) as api:
+        config = tap_config(
+            api.url,
+            players=0,
+            overrides={"auth_tokens": ["other"], "prioritize_ladder_players": True},
+        )
+        messages = sync(config)
+        state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+        # Once the key is dropped from the config, its bookmarks go with it.
+        rerun = sync(config | {"auth_token": "other", "auth_tokens": []}, state)
+
+    def pinned(messages):
+        state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+        return [
+            partition["context"]["api_key_id"]
+            for stream_state in state["bookmarks"].values()
+            for partition in stream_state.get("partitions", [])
+            if partition.get("interrupted")
+        ]
+
+    assert pinned(messages)
+    assert set(pinned(messages)) == {key_id("mock")}
+    assert not pinned(rerun)
+
+
+def test_skips_idle_followed_players_until_recheck():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=2, overrides={})
+        config["following"] = {"NA1": config["following"]["NA1"] | {"leagues": []}}
+        messages = sync(config)
+        state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+        # The stand-in API ignores time windows, so fake an idle check.
+        for entry in state["player_match_history_state"].values():
+            entry["idle"] = True
+
+        requests = api.requests
+        messages = sync(config | {"idle_player_recheck_hours": 12}, state)
+
+    assert api.requests == requests
+    assert not [m for m in messages if m.get("stream") == "tft_player_match_history"]
+
+
+def test_prefetched_ladder_pages_arrive_in_order():
+    world = SyntheticWorld(ladder_size=210, apex_size=3, matches_per_player=1)
+    ladders = []
+    limits = "100000:10"
+    with MockRiotAPI(world, app_limits=limits, method_limits=limits) as api:
+        config = tap_config(api.url, players=0, overrides={})
+        config["following"] = {"EUW1": config["following"]["EUW1"]}
+        for depth in (1, 3):
+            messages = sync(config | {"ladder_prefetch_pages": depth})
+            ladders.append(
+                [
+                    m["record"]
+                    for m in messages
+                    if m["type"] == "RECORD" and m["stream"] == "normal_ranked_ladder"
+                ]
+            )
+
+    assert len(ladders[0]) == 210
+    assert ladders[1] == ladders[0]
+
+
+def test_run_stopped_by_budget_resumes_where_it_stopped():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=20)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=0, overrides={})
+        config["following"] = {"NA1": {"leagues": [{"name": "iron", "division": 4}]}}
+        messages = sync(config)
+        state = [m for m in messages if m["type"] == "STATE"][-1]["value"]
+        # Two new ranked games each, so histories start with a short page.
+        for entry in state["player_match_history_state"].values():
+            entry["matches_played"] -= 2
+
+        def history(messages):
+            return [
+                m["record"]["matchId"]
+                for m in messages
+                if m["type"] == "RECORD"
+                and m["stream"] == "normal_ranked_ladder_match_history"
+            ]
+
+        expected = history(sync(config, json.loads(json.dumps(state))))
+        requests = api.requests
+        # The ladder page and the first player's short page, then stop.
+        stopped = sync(config | {"max_requests": 2}, json.loads(json.dumps(state)))
+        assert api.requests - requests == 2
+        stopped_state = [m for m in stopped if m["type"] == "STATE"][-1]["value"]
+        (partition,) = stopped_state["bookmarks"][
+            "normal_ranked_ladder_match_history"
+        ]["partitions"]
+        assert partition["interrupted"]
+
+        resumed = sync(config, stopped_state)
+
+    assert sorted(history(stopped) + history(resumed)) == sorted(expected)
+
+
+def test_interrupted_history_is_dropped_once_finished_under_a_new_entry():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=20)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=0, overrides={})
+        config["following"] = {"NA1": {"leagues": [{"name": "iron", "division": 4}]}}
+        state = [m for m in sync(config) if m["type"] == "STATE"][-1]["value"]
+        for entry in state["player_match_history_state"].values():
+            entry["matches_played"] -= 2
+        stopped = sync(config | {"max_requests": 2}, state)
+        stopped_state = [m for m in stopped if m["type"] == "STATE"][-1]["value"]
+        bookmarks = stopped_state["bookmarks"]["normal_ranked_ladder_match_history"]
+        (partition,) = bookmarks["partitions"]
+        # The player has played since, so the ladder entry no longer matches.
+        partition["context"]["matches_played"] -= 1
+
+        resumed = sync(config, stopped_state)
+
+    final_state = [m for m in resumed if m["type"] == "STATE"][-1]["value"]
+    partitions = final_state["bookmarks"]["normal_ranked_ladder_match_history"].get(
+        "partitions", []
+    )
+    assert not [partition for partition in partitions if partition.get("interrupted")]
+
+
+def test_shards_sync_everything_between_them():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=2, overrides={})
+        full = sync(config)
+        # NA1 and EUW1 are in different regions, so one shard syncs each.
+        shards = [sync(config | {"shard": f"{index}/2"}) for index in (1, 2)]
+
+    def ladder(messages):
+        return {
+            message["record"]["puuid"]
+            for message in messages
+            if message["type"] == "RECORD"
+            and message["stream"] == "normal_ranked_ladder"
+        }
+
+    assert ladder(shards[0]) and ladder(shards[1])
+    assert not ladder(shards[0]) & ladder(shards[1])
+    assert ladder(shards[0]) | ladder(shards[1]) == ladder(full)
+
+
+def test_merged_shards_drop_the_interrupted_history_its_shard_finished():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=20)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=0, overrides={})
+        config["following"] = {
+            platform: {"leagues": [{"name": "iron", "division": 4}]}
+            for platform in ("NA1", "EUW1")
+        }
+        state = [m for m in sync(config) if m["type"] == "STATE"][-1]["value"]
+        for entry in state["player_match_history_state"].values():
+            entry["matches_played"] -= 2
+        stopped = sync(config | {"max_requests": 2}, state)
+        stopped_state = [m for m in stopped if m["type"] == "STATE"][-1]["value"]
+        history = "normal_ranked_ladder_match_history"
+        assert stopped_state["bookmarks"][history]["partitions"][0]["interrupted"]
+
+        shard_states = [
+            [
+                m
+                for m in sync(
+                    config | {"shard": f"{index}/2"},
+                    json.loads(json.dumps(stopped_state)),
+                )
+                if m["type"] == "STATE"
+            ][-1]["value"]
+            for index in (1, 2)
+        ]
+
+    merged = merge_shard_states(shard_states)
+    partitions = merged["bookmarks"][history].get("partitions", [])
+    assert not [partition for partition in partitions if partition.get("interrupted")]
+
+
+def test_streams_share_one_connection():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        sync(tap_config(api.url, players=2, overrides={}))
+
+    assert api.requests > 50
+    assert api.connections == 1
+
+
+def test_pipeline_syncs_the_same_records():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        serial = sync(tap_config(api.url, players=2, overrides={}))
+        pipelined = sync(
+            tap_config(api.url, players=2, overrides={"pipeline_sync": True})
+        )
+
+    assert records(pipelined) == records(serial)
+    assert pipelined[-1]["type"] == "STATE"
+    assert not pipelined[-1]["value"]["match_detail_queue"]
+
+
+def test_pipeline_stages_share_the_app_limit_without_429s():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=6)
+    with MockRiotAPI(
+        world, latency=0.05, app_limits="20:1", method_limits="1000:10"
+    ) as api:
+        sync(tap_config(api.url, players=2, overrides={"pipeline_sync": True}))
+
+    # The history and detail stages send side by side on separate gates.
+    assert api.throttled == 0
+
+
+def test_concurrent_sync_syncs_the_same_records():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        serial = sync(tap_config(api.url, players=2, overrides={}))
+        concurrent = sync(
+            tap_config(api.url, players=2, overrides={"concurrent_sync": True})
+        )
+
+    assert records(concurrent) == records(serial)
+    assert not concurrent[-1]["value"]["match_detail_queue"]
+
+
+def test_concurrent_sync_prefetches_ladders_side_by_side():
+    world = SyntheticWorld(ladder_size=410, apex_size=3, matches_per_player=0)
+    limits = "100000:10"
+    with MockRiotAPI(world, app_limits=limits, method_limits=limits) as api:
+        config = tap_config(api.url, players=0, overrides={"state_flush_records": 1000})
+        config["following"] = {
+            platform: {"leagues": [{"name": "iron", "division": 4}]}
+            for platform in ("NA1", "EUW1")
+        }
+        serial = sync(config)
+        state = [m for m in serial if m["type"] == "STATE"][-1]["value"]
+        # Nobody has played since, so only the ladder pages are requested.
+        api.latency = 0.05
+        concurrent = sync(
+            config | {"concurrent_sync": True, "ladder_prefetch_pages": 4}, state
+        )
+
+    def ladder(messages):
+        return sorted(
+            json.dumps(m["record"], sort_keys=True)
+            for m in messages
+            if m["type"] == "RECORD" and m["stream"] == "normal_ranked_ladder"
+        )
+
+    assert ladder(concurrent) == ladder(serial)
+    # Both ladders had more than one page in flight at once.
+    assert api.peak_in_flight > 4
+
+
+def test_run_killed_on_a_delta_restarts_from_the_merged_state():
+    world = SyntheticWorld(ladder_size=12, apex_size=3, matches_per_player=4)
+    with MockRiotAPI(world) as api:
+        config = tap_config(api.url, players=2, overrides={"delta_state": True})
+        control = sync(config)
+        # Killed halfway through, the last STATE saved is a delta.
+        states = [i for i, m in enumerate(control) if m["type"] == "STATE"]
+        cut = next(
+            i for i in states[len(states) // 2 :] if control[i]["value"].get("delta")
+        )
+        killed = control[: cut + 1]
+
+        with pytest.raises(ValueError, match="delta STATE message"):
+            sync(config, killed[-1]["value"])
+
+        state = {}
+        for message in killed:
+            if message["type"] == "STATE":
+                state = apply_state_delta(state, message["value"])
+        assert not state.get("delta")
+        restarted = sync(config, json.loads(json.dumps(state)))
+
+    assert len(records(restarted)) < len(records(control))
+    assert set(records(killed) + records(restarted)) == set(records(control))
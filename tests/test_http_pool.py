@@ -0,0 +1,23 @@
+"""Tests for the HTTP session shared by every stream."""
+
+from benchmarks.mock_riot_api import MockRiotAPI
+from tap_riotapi.http_pool import ConnectionMetric, SharedSession
+
+
+def test_reuses_connections_and_counts_them():
+    session = SharedSession(pool_size=2)
+    with MockRiotAPI() as api:
+        url = api.url.replace("{routing_value}", "americas")
+        for _ in range(3):
+            response = session.get(f"{url}/riot/account/v1/accounts/by-riot-id/a/b")
+            assert response.json()["gameName"] == "a"
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert api.connections == 1
+    assert list(session.connection_counts().values()) == [(1, 3)]
+    reused = [
+        point.value
+        for point in session.points()
+        if point.metric == ConnectionMetric.REUSED
+    ]
+    assert reused == [2]
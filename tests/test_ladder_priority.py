@@ -0,0 +1,41 @@
+"""Tests for ordering ladder players by expected new matches."""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from tap_riotapi.streams.mixins.tft_endpts import TFTRankedLadderMixin
+
+
+def ladder_stream(player_state: dict) -> TFTRankedLadderMixin:
+    now = datetime(2026, 10, 17, tzinfo=timezone.utc)
+    stream = TFTRankedLadderMixin.__new__(TFTRankedLadderMixin)
+    stream._tap = SimpleNamespace(
+        initial_timestamp=now - timedelta(days=7), end_timestamp=now
+    )
+    stream.tap_state = {"player_match_history_state": player_state}
+    return stream
+
+
+def player(puuid: str, matches_played: int, tier: str = "IRON") -> dict:
+    return {"puuid": puuid, "matches_played": matches_played, "tier": tier}
+
+
+def test_most_new_matches_first():
+    yesterday = datetime(2026, 10, 16, tzinfo=timezone.utc)
+    stream = ladder_stream(
+        {
+            "busy": {"matches_played": 100, "last_processed": yesterday},
+            "quiet": {"matches_played": 199, "last_processed": yesterday},
+        }
+    )
+    players = [
+        player("quiet", 200),
+        player("new", 60, tier="DIAMOND"),
+        player("busy", 110),
+        player("new_iron", 60),
+    ]
+
+    ordered = sorted(players, key=stream.child_priority)
+
+    # New players are guessed at 60 * 7 / 120 = 3.5 new matches.
+    assert [p["puuid"] for p in ordered] == ["busy", "new", "new_iron", "quiet"]
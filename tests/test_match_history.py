@@ -0,0 +1,26 @@
+"""Tests for match history paging."""
+
+import json
+
+import requests
+
+from tap_riotapi.streams.mixins.match_history import MatchHistoryPaginator
+
+
+def page(ids: list[str]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(ids).encode()
+    return response
+
+
+def test_right_sized_first_page_falls_back_to_full_pages():
+    paginator = MatchHistoryPaginator(start_value=0, page_size=500, first_page_size=8)
+    assert paginator.current_page_size == 8
+
+    paginator.advance(page([f"NA1_{n}" for n in range(8)]))
+    assert paginator.current_value == 8
+    assert paginator.current_page_size == 500
+
+    paginator.advance(page(["NA1_9"]))
+    assert paginator.finished
@@ -0,0 +1,43 @@
+"""Tests for the compact match ID set."""
+
+from datetime import date
+
+from tap_riotapi.match_id_set import MatchIdSet
+
+
+def test_membership_survives_round_trip():
+    match_ids = MatchIdSet(today="2026-10-01")
+    for number in (5012345678, 5012345690, 5012340000):
+        match_ids.add(f"NA1_{number}")
+    match_ids.add("EUW1_7000000001")
+
+    restored = MatchIdSet.from_dict(match_ids.to_dict())
+
+    assert "NA1_5012345690" in restored
+    assert "EUW1_7000000001" in restored
+    assert "NA1_5012345691" not in restored
+    assert "EUW1_5012345678" not in restored
+    assert len(restored) == 4
+
+
+def test_evicts_days_before_horizon():
+    state = {}
+    for day, match_id in (("2026-09-01", "NA1_1"), ("2026-09-20", "NA1_2")):
+        added = MatchIdSet(today=day)
+        added.add(match_id)
+        state.setdefault("NA1", {}).update(added.to_dict()["NA1"])
+    match_ids = MatchIdSet.from_dict(state)
+
+    match_ids.evict_before(date(2026, 9, 15))
+
+    assert "NA1_1" not in match_ids
+    assert "NA1_2" in match_ids
+    assert list(match_ids.to_dict()["NA1"]) == ["2026-09-20"]
+
+
+def test_reads_legacy_id_list():
+    match_ids = MatchIdSet.from_ids(["NA1_10", "KR_20"])
+
+    assert "NA1_10" in match_ids
+    assert "KR_20" in match_ids
+    assert "not-a-match-id" not in match_ids
@@ -0,0 +1,30 @@
+"""Tests for the message writers."""
+
+import json
+from datetime import datetime, timezone
+
+from singer_sdk.singerlib import RecordMessage, StateMessage
+
+from tap_riotapi.utils import FastMessageWriter, MessageWriter
+
+
+def test_fast_writer_holds_records_until_state(capsys):
+    record = RecordMessage(
+        stream="tft_player_match_detail",
+        record={
+            "matchId": "NA1_1",
+            "endTime": datetime(2026, 10, 1, tzinfo=timezone.utc),
+        },
+    )
+    state = StateMessage(value={"match_detail_set": {"NA1": {}}})
+    writer = FastMessageWriter(flush_interval=3600)
+
+    writer.write_message(record)
+    assert capsys.readouterr().out == ""
+
+    writer.write_message(state)
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        json.loads(MessageWriter().serialize_message(message))
+        for message in (record, state)
+    ]
@@ -0,0 +1,45 @@
+"""Tests for the pipelined sync's stages."""
+
+import pytest
+
+from tap_riotapi.pipeline import DETAILS, HISTORY, SyncPipeline
+
+
+def test_full_queue_holds_back_submitter():
+    pipeline = SyncPipeline(history_queue_size=1)
+    done = []
+
+    def history(n):
+        # Each history hands its match to the details stage.
+        pipeline.submit(DETAILS, "americas", lambda: done.append(("detail", n)))
+        done.append(("history", n))
+
+    with pipeline.lane():
+        for n in range(3):
+            pipeline.submit(HISTORY, "americas", lambda n=n: history(n))
+            # The ladder never gets more than one player ahead.
+            assert len(pipeline._queues[HISTORY, "americas"]) <= 1
+    pipeline.join()
+
+    assert [item for item in done if item[0] == "history"] == [
+        ("history", 0),
+        ("history", 1),
+        ("history", 2),
+    ]
+    assert sorted(item for item in done if item[0] == "detail") == [
+        ("detail", 0),
+        ("detail", 1),
+        ("detail", 2),
+    ]
+
+
+def test_stage_error_is_raised_by_join():
+    pipeline = SyncPipeline()
+
+    def fail():
+        raise ValueError("stage failed")
+
+    with pipeline.lane():
+        pipeline.submit(HISTORY, "europe", fail)
+    with pytest.raises(ValueError, match="stage failed"):
+        pipeline.join()
@@ -0,0 +1,57 @@
+"""Tests for the sync profiler."""
+
+import json
+import threading
+import time
+
+from tap_riotapi.profiling import SyncProfiler
+
+
+class FakeStream:
+
+    def post_process(self, row):
+        return json.loads(json.dumps(row))
+
+    def _write_record_message(self, record):
+        json.dumps(record)
+
+
+def test_splits_time_into_phases(tmp_path):
+    profiler = SyncProfiler(tmp_path)
+    stream = FakeStream()
+
+    with profiler.profile("players"):
+        for index in range(200):
+            stream._write_record_message(stream.post_process({"index": index}))
+        time.sleep(0.05)
+
+    phases = profiler.phases("players")
+    assert phases["rate limit sleep"] >= 0.05
+    assert phases["post_process"] > 0
+    assert phases["message serialisation"] > 0
+    assert phases["network wait"] == 0
+
+    profiler.write_report("players")
+    report = (tmp_path / "players.txt").read_text()
+    assert report.startswith("players: ")
+    assert "time.sleep" not in report
+    assert (tmp_path / "players.prof").exists()
+
+
+def test_profiles_lane_threads(tmp_path, caplog):
+    profiler = SyncProfiler(tmp_path)
+    stream = FakeStream()
+
+    def lane():
+        with profiler.lane():
+            for index in range(200):
+                stream.post_process({"index": index})
+
+    with profiler.profile("players"):
+        thread = threading.Thread(target=lane)
+        thread.start()
+        thread.join()
+
+    assert profiler.phases("players")["post_process"] > 0
+    # From Python 3.12, a lane can't enable a profiler of its own.
+    assert "another profiler" not in caplog.text
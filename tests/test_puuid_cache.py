@@ -0,0 +1,37 @@
+"""Tests for the Riot ID to PUUID cache."""
+
+from datetime import datetime, timedelta, timezone
+
+from tap_riotapi.puuid_cache import PuuidCache
+
+
+def test_entries_expire_after_ttl():
+    cache = PuuidCache()
+    today = datetime.now(timezone.utc).date()
+    cache.put("Player", "NA1", "fresh-puuid", day=today - timedelta(days=29))
+    cache.put("Other", "NA1", "stale-puuid", day=today - timedelta(days=31))
+
+    restored = PuuidCache.from_dict(cache.to_dict(), ttl_days=30)
+
+    assert restored.get("player", "na1") == "fresh-puuid"
+    assert restored.get("Other", "NA1") is None
+    assert len(restored) == 1
+
+
+def test_refresh_ignores_cached_entries():
+    cache = PuuidCache(refresh=True)
+    cache.put("Player", "NA1", "puuid")
+
+    assert cache.get("Player", "NA1") is None
+    assert len(cache) == 1
+
+
+def test_remembers_the_key_each_puuid_was_resolved_with():
+    cache = PuuidCache()
+    cache.put("Player", "NA1", "puuid", api_key_id="abc")
+    cache.put("Other", "NA1", "other-puuid")
+
+    restored = PuuidCache.from_dict(cache.to_dict())
+
+    assert restored.api_key_id("Player", "NA1") == "abc"
+    assert restored.api_key_id("Other", "NA1") is None
@@ -0,0 +1,120 @@
+"""Tests for the rate limit buckets."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from tap_riotapi import rate_limiting
+from tap_riotapi.rate_limiting import RateLimitState, _RateLimitRecord
+
+MATCH_DETAIL = "/tft/match/v1/matches/{matchId}"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiting, "monotonic", fake)
+    return fake
+
+
+def record(rate_cap: str, rate_count: str) -> _RateLimitRecord:
+    return _RateLimitRecord(
+        datetime_returned=datetime.now(timezone.utc),
+        rate_cap=rate_cap,
+        rate_count=rate_count,
+    )
+
+
+def test_no_wait_before_any_response(clock):
+    assert RateLimitState().request_wait("americas", MATCH_DETAIL) == 0
+
+
+def test_waits_for_window_once_app_cap_is_reached(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("20:1,100:120", "1:1,1:120"))
+    clock.now += 10
+    state.log_response("americas", record("20:1,100:120", "1:1,100:120"))
+
+    assert state.request_wait("americas", MATCH_DETAIL) == pytest.approx(110)
+    assert state.request_wait("europe", MATCH_DETAIL) == 0
+
+    clock.now += 110
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+
+
+def test_method_cap_only_applies_to_its_endpoint(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("20:1,100:120", "1:1,1:120"))
+    state.log_response("americas", record("250:10", "250:10"), endpoint=MATCH_DETAIL)
+
+    assert state.request_wait("americas", MATCH_DETAIL) == pytest.approx(10)
+    match_ids = "/tft/match/v1/matches/by-puuid/{puuid}/ids"
+    assert state.request_wait("americas", match_ids) == 0
+
+
+def test_lower_reported_count_starts_a_new_window(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("20:1", "20:1"))
+    assert state.request_wait("americas", MATCH_DETAIL) == pytest.approx(1)
+
+    clock.now += 0.5
+    state.log_response("americas", record("20:1", "1:1"))
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+
+
+def test_requests_in_flight_count_against_the_cap(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("3:1", "1:1"))
+
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+    assert state.request_wait("americas", MATCH_DETAIL, book=False) == 1
+
+    state.settle("americas", MATCH_DETAIL)
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+
+
+def test_late_lower_count_from_a_request_in_flight_is_stale(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("20:1", "5:1"))
+    for _ in range(3):
+        state.request_wait("americas", MATCH_DETAIL)
+
+    clock.now += 0.5
+    state.settle("americas", MATCH_DETAIL, record("20:1", "8:1"))
+    state.settle("americas", MATCH_DETAIL, record("20:1", "6:1"))
+    # Overtaken by the 8th request's response, not a window reset.
+    assert state.to_dict()["americas"]["app"]["buckets"]["1"]["count"] == 8
+
+    state.settle("americas", MATCH_DETAIL, record("20:1", "2:1"))
+    assert state.to_dict()["americas"]["app"]["buckets"]["1"]["count"] == 2
+
+
+def test_state_round_trip_keeps_open_windows_only(clock):
+    state = RateLimitState()
+    state.log_response("americas", record("20:1,100:120", "20:1,100:120"))
+    clock.now += 5
+
+    restored = RateLimitState.from_dict(state.to_dict())
+
+    assert list(restored.to_dict()["americas"]["app"]["buckets"]) == ["120"]
+    assert restored.request_wait("americas", MATCH_DETAIL) == pytest.approx(115, abs=1)
+    assert restored.request_wait("europe", MATCH_DETAIL) == 0
+
+
+def test_pacing_spreads_requests_over_the_tightest_window(clock):
+    state = RateLimitState(pacing=0.5)
+    state.log_response("americas", record("20:1,100:120", "1:1,1:120"))
+
+    assert state.request_wait("americas", MATCH_DETAIL) == 0
+    # 49 of the 50 requests budgeted at 50% are left for the next 120 seconds.
+    assert state.request_wait("americas", MATCH_DETAIL) == pytest.approx(120 / 49)
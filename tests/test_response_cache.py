@@ -0,0 +1,29 @@
+"""Tests for the match detail response cache."""
+
+import os
+
+from tap_riotapi.response_cache import MatchDetailCache
+
+
+def test_round_trip_survives_reopening(tmp_path):
+    MatchDetailCache(tmp_path, max_bytes=1 << 20).put("americas", "NA1_1", b'{"a":1}')
+
+    cache = MatchDetailCache(tmp_path, max_bytes=1 << 20)
+
+    assert cache.get("americas", "NA1_1") == b'{"a":1}'
+    assert cache.get("europe", "NA1_1") is None
+
+
+def test_evicts_least_recently_used_past_cap(tmp_path):
+    body = os.urandom(1024)  # doesn't compress
+    cache = MatchDetailCache(tmp_path, max_bytes=len(body) * 2 + 100)
+    cache.put("americas", "NA1_1", body)
+    cache.put("americas", "NA1_2", body)
+    cache.get("americas", "NA1_1")
+
+    cache.put("americas", "NA1_3", body)
+
+    assert len(cache) == 2
+    assert cache.get("americas", "NA1_2") is None
+    assert cache.get("americas", "NA1_1") == body
+    assert not (tmp_path / "americas" / "NA1_2.json.z").exists()
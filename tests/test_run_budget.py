@@ -0,0 +1,28 @@
+"""Tests for the run budget."""
+
+from unittest import mock
+
+from tap_riotapi import run_budget
+from tap_riotapi.run_budget import RunBudget
+
+
+def test_exhausted_by_requests_or_deadline():
+    budget = RunBudget(max_requests=2)
+    budget.spend()
+    assert not budget.exhausted
+    budget.spend()
+    assert budget.exhausted
+
+    with mock.patch.object(run_budget, "monotonic", return_value=0.0):
+        budget = RunBudget(max_seconds=60)
+    with mock.patch.object(run_budget, "monotonic", return_value=59.0):
+        assert not budget.exhausted
+    with mock.patch.object(run_budget, "monotonic", return_value=60.0):
+        assert budget.exhausted
+
+
+def test_unlimited_by_default():
+    budget = RunBudget()
+    for _ in range(1000):
+        budget.spend()
+    assert not budget.exhausted
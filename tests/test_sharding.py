@@ -0,0 +1,113 @@
+"""Tests for sharding a sync and merging the shards' states."""
+
+import pytest
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_riotapi.match_id_set import MatchIdSet
+from tap_riotapi.sharding import Shard, merge_shard_states
+
+
+def test_parse_rejects_bad_specs():
+    assert Shard.parse("2/4").index == 2
+    for spec in ("0/4", "5/4", "2", "a/b"):
+        with pytest.raises(ConfigValidationError):
+            Shard.parse(spec)
+    with pytest.raises(ConfigValidationError):
+        Shard.parse("1/2", by="player")
+
+
+def test_each_context_belongs_to_one_shard():
+    shards = [Shard.parse(f"{i}/3", platforms=("NA1", "EUW1")) for i in (1, 2, 3)]
+    # The followed regions go to different shards.
+    assert [s.owns({"region_routing_value": "americas"}) for s in shards] != [
+        s.owns({"region_routing_value": "europe"}) for s in shards
+    ]
+
+    shards = [Shard.parse(f"{i}/3", by="partition") for i in (1, 2, 3)]
+    contexts = [
+        {"gameName": f"Player{n}", "tagLine": "NA1"} for n in range(30)
+    ] + [
+        {"platform_routing_value": "na1", "tier": "IRON", "division": str(n)}
+        for n in range(1, 5)
+    ]
+    owners = [[s.owns(context) for s in shards].count(True) for context in contexts]
+    assert owners == [1] * len(contexts)
+    # A child context goes with the partition it descends from.
+    child = {"gameName": "player0", "tagLine": "na1", "puuid": "p", "matchId": "m"}
+    assert [s.owns(child) for s in shards] == [s.owns(contexts[0]) for s in shards]
+
+
+def test_merge_shard_states():
+    queued = {"context": {"matchId": "NA1_3"}}
+    merged = merge_shard_states(
+        [
+            {
+                "player_match_history_state": {
+                    "a": {"last_processed": "2024-01-02"},
+                    "b": {"last_processed": "2024-01-01"},
+                },
+                "match_detail_set": MatchIdSet.from_ids(["NA1_1"]).to_dict(),
+                "match_detail_queue": {"americas": [queued]},
+                "riot_id_puuids": {"x#na1": ["old", "2024-01-01"]},
+            },
+            {
+                "player_match_history_state": {
+                    "b": {"last_processed": "2024-01-03"},
+                },
+                "match_detail_set": MatchIdSet.from_ids(["NA1_2", "NA1_3"]).to_dict(),
+                "match_detail_queue": {"americas": [queued]},
+                "riot_id_puuids": {"x#na1": ["new", "2024-01-05"]},
+            },
+        ]
+    )
+
+    assert merged["player_match_history_state"] == {
+        "a": {"last_processed": "2024-01-02"},
+        "b": {"last_processed": "2024-01-03"},
+    }
+    assert all(
+        match_id in MatchIdSet.from_dict(merged["match_detail_set"])
+        for match_id in ("NA1_1", "NA1_2", "NA1_3")
+    )
+    # The second shard already fetched the match the first one queued.
+    assert merged["match_detail_queue"] == {}
+    assert merged["riot_id_puuids"] == {"x#na1": ["new", "2024-01-05"]}
+
+
+def test_merge_takes_bookmarks_from_the_owning_shard():
+    shards = [Shard.parse(f"{i}/2", platforms=("NA1", "EUW1")) for i in (1, 2)]
+    interrupted = {
+        "context": {"region_routing_value": "americas", "puuid": "a"},
+        "interrupted": True,
+    }
+    europe = {
+        "context": {"region_routing_value": "europe", "puuid": "b"},
+        "interrupted": True,
+    }
+    history = "normal_ranked_ladder_match_history"
+    merged = merge_shard_states(
+        [
+            # The americas shard finished the interrupted history.
+            {
+                "shard": shards[0]._asdict(),
+                "bookmarks": {history: {"partitions": [europe]}},
+                "player_match_history_state": {
+                    "a": {"last_processed": "2024-01-02", "shard": "1/2"},
+                },
+            },
+            # The europe shard still carries it, as it was before the sync.
+            {
+                "shard": shards[1]._asdict(),
+                "bookmarks": {history: {"partitions": [interrupted, europe]}},
+                "player_match_history_state": {
+                    "a": {"last_processed": "2024-01-02", "matches_played": 3},
+                },
+            },
+        ]
+    )
+
+    assert merged["bookmarks"][history]["partitions"] == [europe]
+    assert merged["player_match_history_state"] == {
+        "a": {"last_processed": "2024-01-02"}
+    }
+    assert "shard" not in merged
@@ -0,0 +1,73 @@
+"""Tests for STATE message output."""
+
+from copy import deepcopy
+from datetime import datetime, timezone
+
+from tap_riotapi.match_id_set import MatchIdSet
+from tap_riotapi.puuid_cache import PuuidCache
+from tap_riotapi.state_writer import StateWriter, apply_state_delta
+
+
+class FakeTap:
+
+    def __init__(self):
+        self.state = {
+            "bookmarks": {},
+            "player_match_history_state": {},
+            "match_detail_set": MatchIdSet(),
+            "match_detail_queue": {},
+            "rate_limits": {},
+            "riot_id_puuids": PuuidCache(),
+        }
+        self.messages = []
+
+    def write_message(self, message):
+        # Copies the state as written, with state objects in their JSON form.
+        self.messages.append(deepcopy(message.value))
+
+
+def fetch_match(tap, writer, puuid, match_id):
+    tap.state["player_match_history_state"][puuid] = {
+        "last_processed": datetime(2026, 10, 1, tzinfo=timezone.utc)
+    }
+    tap.state["bookmarks"]["match_history"] = {
+        "partitions": [{"context": {"puuid": puuid}}]
+    }
+    tap.state["match_detail_set"].add(match_id)
+    writer.record_written()
+    writer.mark_dirty("match_history")
+    writer.write()
+
+
+def test_flushes_every_n_records():
+    tap = FakeTap()
+    writer = StateWriter(tap, flush_records=3)
+
+    for index in range(7):
+        fetch_match(tap, writer, f"p{index}", f"NA1_{index}")
+
+    assert len(tap.messages) == 2
+
+
+def test_deltas_merge_into_the_full_state():
+    tap = FakeTap()
+    writer = StateWriter(tap, delta=True)
+
+    for index in range(4):
+        fetch_match(tap, writer, f"p{index}", f"NA1_{index}")
+    with writer.closing():
+        pass
+
+    first, *deltas, final = tap.messages
+    assert not first.get("delta")
+    assert all(delta["delta"] for delta in deltas)
+    assert deltas[-1]["player_match_history_state"].keys() == {"p3"}
+    assert deltas[-1]["match_detail_set"] == ["NA1_3"]
+
+    merged = first
+    for delta in deltas:
+        merged = apply_state_delta(merged, delta)
+    assert merged["player_match_history_state"] == final["player_match_history_state"]
+    assert merged["match_detail_set"] == final["match_detail_set"]
+    # Closing compacts away the partition that only held its context.
+    assert final["bookmarks"]["match_history"] == {"partitions": []}
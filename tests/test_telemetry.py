@@ -0,0 +1,51 @@
+"""Tests for the rate limit telemetry."""
+
+import json
+import logging
+from datetime import datetime, timezone
+
+from tap_riotapi.rate_limiting import _RateLimitRecord
+from tap_riotapi.telemetry import RateLimitTelemetry
+
+MATCH_DETAIL = "/tft/match/v1/matches/{matchId}"
+
+
+def test_reports_metrics_and_prometheus_file(tmp_path, caplog):
+    prometheus_file = tmp_path / "riotapi.prom"
+    telemetry = RateLimitTelemetry(prometheus_file=str(prometheus_file))
+    telemetry.log_request("americas", MATCH_DETAIL, 0.0)
+    telemetry.log_request("americas", MATCH_DETAIL, 1.5)
+    telemetry.log_throttled("americas", MATCH_DETAIL, 3.0)
+    returned = datetime.now(timezone.utc)
+    telemetry.log_response(
+        "americas", _RateLimitRecord(returned, "20:1,100:120", "10:1,80:120")
+    )
+    telemetry.log_response(
+        "americas", _RateLimitRecord(returned, "20:1,100:120", "2:1,81:120")
+    )
+
+    with caplog.at_level(logging.INFO, logger="singer_sdk.metrics"):
+        telemetry.report()
+
+    points = [
+        json.loads(message.split("METRIC: ", 1)[1]) for message in caplog.messages
+    ]
+    values = {
+        (point["metric"], point["tags"].get("window")): point["value"]
+        for point in points
+    }
+    assert values["rate_limit_requests", None] == 2
+    assert values["rate_limit_sleep_count", None] == 1
+    assert values["rate_limit_sleep_seconds", None] == 1.5
+    assert values["rate_limit_throttled_count", None] == 1
+    assert values["rate_limit_retry_after_seconds", None] == 3.0
+    assert values["rate_limit_utilisation", "1"] == 0.1
+    assert values["rate_limit_peak_utilisation", "1"] == 0.5
+    assert values["rate_limit_peak_utilisation", "120"] == 0.81
+
+    lines = prometheus_file.read_text().splitlines()
+    assert "# TYPE tap_riotapi_rate_limit_sleep_seconds_total counter" in lines
+    assert (
+        'tap_riotapi_rate_limit_sleep_seconds_total{routing_value="americas",'
+        f'endpoint="{MATCH_DETAIL}"}} 1.5'
+    ) in lines